@@ -0,0 +1,219 @@
+"""Latency microbenchmarks for the recommender hot paths.
+
+Times each hot path over a fixed set of job descriptions and reports p50/p95/p99
+latency plus the traced allocation peak per call. Results can be saved as a JSON
+baseline and later runs compared against it; the run fails (exit code 1) when a
+case's p50 or p95 regresses by more than `--threshold` over the baseline.
+
+Run (from the `shl_recommender` folder):
+  python benchmark.py                       # run and compare to data/bench_baseline.json
+  python benchmark.py --save-baseline       # run and overwrite the baseline
+  python benchmark.py --only recommend --iterations 500 --threshold 0.3
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).parent
+DATA = ROOT / 'data'
+FIXTURES = DATA / 'fixtures'
+BASELINE_PATH = DATA / 'bench_baseline.json'
+
+DEFAULT_QUERIES = [
+    "Need a Java developer who is good in collaborating with external teams and stakeholders.",
+    "Looking to hire mid-level professionals who are proficient in Python, SQL and Java Script.",
+    "Entry level customer service representative with strong communication and data entry skills.",
+    "Senior sales manager to lead a regional team; leadership and negotiation experience required.",
+]
+
+
+def load_queries(limit=8):
+    """Benchmark queries: a few fixed ones plus the first labeled queries, if parsed."""
+    queries = list(DEFAULT_QUERIES)
+    train = DATA / 'train.json'
+    if train.exists():
+        rows = json.loads(train.read_text(encoding='utf-8'))
+        queries.extend(r['query'] for r in rows if r.get('query'))
+    return queries[:limit]
+
+
+def load_fixtures():
+    return [p.read_text(encoding='utf-8') for p in sorted(FIXTURES.glob('*.html'))]
+
+
+def build_cases(queries):
+    """Return {name: callable(i)} where i is the iteration number."""
+    import recommender
+    import serialization
+    from main import app, extract_text_from_html
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    pages = load_fixtures()
+    # measure the pipeline itself, not repeated-query cache hits
+    recommender._query_cache.maxsize = recommender._result_cache.maxsize = 0
+    ranked = [recommender.recommend(q, top_k=10) for q in queries]
+
+    def pick(i):
+        return queries[i % len(queries)]
+
+    def skill_scoring(i):
+        return recommender._skill_scores(pick(i), recommender._all_indices)
+
+    def endpoint(i):
+        resp = client.post('/recommend', json={'job_description': pick(i), 'top_k': 10})
+        resp.raise_for_status()
+        return resp
+
+    cases = {
+        'recommend': lambda i: recommender.recommend(pick(i), top_k=10),
+        'recommend_balanced': lambda i: recommender.recommend_balanced(pick(i), top_k=10),
+        'query_embedding_tfidf': lambda i: recommender._compute_query_embedding_via_tfidf(pick(i)),
+        'skill_scoring': skill_scoring,
+        'endpoint_recommend': endpoint,
+        'serialize_results': lambda i: serialization.render_results(ranked[i % len(ranked)]),
+    }
+    if pages:
+        cases['extract_url_text'] = lambda i: extract_text_from_html(pages[i % len(pages)])
+        # full-page extraction padded to a few hundred KB, as pathological URL inputs are
+        long_jds = [(extract_text_from_html(p) + '\n') * (200000 // max(len(p), 1) + 1) for p in pages]
+        cases['recommend_long_jd'] = lambda i: recommender.recommend(long_jds[i % len(long_jds)], top_k=10)
+    return cases
+
+
+def measure(fn, iterations, warmup, alloc_iterations):
+    """Run `fn` and return latency percentiles (ms) and allocation peak per call (bytes)."""
+    for i in range(warmup):
+        fn(i)
+
+    timings = np.empty(iterations, dtype=np.float64)
+    gc.collect()
+    for i in range(iterations):
+        t0 = time.perf_counter_ns()
+        fn(i)
+        timings[i] = time.perf_counter_ns() - t0
+    timings /= 1e6
+
+    # allocation pass runs separately: tracing slows calls down and would skew latency
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(alloc_iterations):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            fn(i)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+    finally:
+        tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {
+        'iterations': iterations,
+        'p50_ms': round(float(p50), 4),
+        'p95_ms': round(float(p95), 4),
+        'p99_ms': round(float(p99), 4),
+        'mean_ms': round(float(timings.mean()), 4),
+        'alloc_peak_bytes': int(np.median(peaks)) if peaks else 0,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return a list of human readable regressions against the baseline."""
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get('cases', {}).get(name)
+        if not base:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            limit = base[key] * (1.0 + threshold)
+            if res[key] > limit:
+                regressions.append(f"{name}: {key} {res[key]:.3f} > {limit:.3f} (baseline {base[key]:.3f}, +{threshold:.0%})")
+    return regressions
+
+
+def print_table(results, baseline):
+    base_cases = baseline.get('cases', {}) if baseline else {}
+    print(f"{'case':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'alloc KiB':>12}{'vs base p50':>14}")
+    for name, res in results.items():
+        delta = ''
+        base = base_cases.get(name)
+        if base and base.get('p50_ms'):
+            delta = f"{(res['p50_ms'] / base['p50_ms'] - 1.0):+.1%}"
+        print(f"{name:<24}{res['p50_ms']:>10.3f}{res['p95_ms']:>10.3f}{res['p99_ms']:>10.3f}"
+              f"{res['alloc_peak_bytes'] / 1024:>12.1f}{delta:>14}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--alloc-iterations', type=int, default=20)
+    parser.add_argument('--only', nargs='*', help='case names to run (default: all)')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH))
+    parser.add_argument('--save-baseline', action='store_true', help='write results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed fractional regression of p50/p95 over baseline (default 0.2)')
+    parser.add_argument('--out', help='also write this run\'s results to a JSON file')
+    args = parser.parse_args(argv)
+
+    cases = build_cases(load_queries())
+    if args.only:
+        unknown = set(args.only) - set(cases)
+        if unknown:
+            parser.error(f"unknown case(s): {', '.join(sorted(unknown))}; available: {', '.join(cases)}")
+        cases = {k: v for k, v in cases.items() if k in args.only}
+
+    results = {}
+    failed = []
+    for name, fn in cases.items():
+        try:
+            results[name] = measure(fn, args.iterations, args.warmup, args.alloc_iterations)
+        except Exception as e:
+            failed.append(f"{name}: {type(e).__name__}: {e}")
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8')) if baseline_path.exists() else {}
+    print_table(results, baseline)
+    for f in failed:
+        print('FAILED', f)
+
+    run = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'iterations': args.iterations,
+        'cases': results,
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(run, indent=2), encoding='utf-8')
+    if args.save_baseline:
+        if baseline and args.only:
+            # keep baseline entries for cases that were not re-run
+            merged = dict(baseline.get('cases', {}))
+            merged.update(results)
+            run['cases'] = merged
+        baseline_path.write_text(json.dumps(run, indent=2), encoding='utf-8')
+        print('Wrote baseline to', baseline_path)
+        return 1 if failed else 0
+
+    if not baseline:
+        print('No baseline at', baseline_path, '- run with --save-baseline to create one')
+        return 1 if failed else 0
+    regressions = compare(results, baseline, args.threshold)
+    if regressions or failed:
+        print('\nPerformance regressions:')
+        for r in regressions:
+            print('  ' + r)
+        return 1
+    print(f'\nNo regressions above {args.threshold:.0%} of baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Small thread-safe LRU caches for per-query work, and single-flight call coalescing.
+
+Hits and misses are counted in `metrics.CACHE_HITS` / `CACHE_MISSES` under the cache
+name. Cached values are shared between callers, so treat them as read-only. Key texts
+(job descriptions) with `text_key()` so an entry costs a fixed 16 bytes of key, not a
+copy of the text.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import metrics
+
+_MISSING = object()
+
+
+def text_key(text):
+    """Fixed-size cache key for a (possibly very long) text."""
+    return hashlib.blake2b((text or '').encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class LRUCache:
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._data.move_to_end(key)
+        if value is _MISSING:
+            metrics.CACHE_MISSES.inc(cache=self.name)
+            return default
+        metrics.CACHE_HITS.inc(cache=self.name)
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is in
+    flight wait and get the same result (or exception). Nothing is kept afterwards.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            metrics.COALESCED.inc(stage=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
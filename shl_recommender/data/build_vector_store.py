@@ -5,10 +5,12 @@ Outputs:
  - data/faiss.index (if FAISS used)
  - data/index_map.json (list of assessment_id in index order)
  - or data/nn_store.pkl (sklearn fallback) and index_map.json
+ - data/neighbours.npz: top-M cosine neighbours of every item (rows in index_map order),
+   `ids` int32 and `scores` float16, served by /similar/{assessment_id}
 
-Run: python data/build_vector_store.py
+Run: python data/build_vector_store.py [--neighbours 50]
 """
-import os
+import argparse
 import json
 import numpy as np
 from pathlib import Path
@@ -19,6 +21,8 @@ CAT = ROOT / 'shl_assessments.json'
 OUT_MAP = ROOT / 'index_map.json'
 OUT_FAISS = ROOT / 'faiss.index'
 OUT_NN = ROOT / 'nn_store.pkl'
+OUT_NEIGHBOURS = ROOT / 'neighbours.npz'
+NEIGHBOURS = 50
 
 def load_embeddings():
     if not EMB.exists():
@@ -62,7 +66,42 @@ def fallback_nn(embs, ids):
     print('Wrote sklearn NN store to', OUT_NN)
     return True
 
+def build_neighbour_graph(embs, m=NEIGHBOURS, block=1024):
+    """Top-`m` cosine neighbours of every row (self excluded), best first.
+
+    Exact blocked brute force: one (block x n) similarity slab at a time.
+    """
+    x = np.asarray(embs, dtype=np.float32)
+    x = x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-12)
+    n = len(x)
+    m = min(m, max(n - 1, 0))
+    ids = np.empty((n, m), dtype=np.int32)
+    scores = np.empty((n, m), dtype=np.float16)
+    for start in range(0, n, block):
+        sims = x[start:start + block] @ x.T
+        rows = np.arange(sims.shape[0])
+        sims[rows, start + rows] = -np.inf
+        if m < n - 1:
+            top = np.argpartition(-sims, m - 1, axis=1)[:, :m]
+        else:
+            top = np.tile(np.arange(n), (sims.shape[0], 1))
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        # best first; equal similarities keep catalog order (except ties at the cut-off)
+        order = np.lexsort((top, -top_sims), axis=1)[:, :m]
+        ids[start:start + block] = np.take_along_axis(top, order, axis=1)
+        scores[start:start + block] = np.take_along_axis(top_sims, order, axis=1)
+    return ids, scores
+
+def write_neighbour_graph(embs, m=NEIGHBOURS):
+    ids, scores = build_neighbour_graph(embs, m)
+    np.savez_compressed(OUT_NEIGHBOURS, ids=ids, scores=scores)
+    print(f'Wrote {ids.shape[1]}-neighbour graph to', OUT_NEIGHBOURS)
+
 def main():
+    parser = argparse.ArgumentParser(description='Build the vector store and item neighbour graph.')
+    parser.add_argument('--neighbours', type=int, default=NEIGHBOURS, help='neighbours kept per item')
+    args = parser.parse_args()
+
     embs = load_embeddings()
     ids, data = load_catalog()
     if embs.shape[0] != len(ids):
@@ -73,6 +112,7 @@ def main():
 
     OUT_MAP.write_text(json.dumps(ids, indent=2), encoding='utf-8')
     print('Wrote index map to', OUT_MAP)
+    write_neighbour_graph(embs, args.neighbours)
 
     if try_faiss(embs.copy(), ids):
         return
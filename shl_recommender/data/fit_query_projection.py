@@ -0,0 +1,120 @@
+"""Fit the sparse-to-dense query projection served by the recommender.
+
+A ridge regression maps the recommender's TF-IDF space onto the (L2-normalised) doc
+embedding space. Training pairs are every catalog document -> its own embedding, plus
+every labeled query (data/train_remapped.json) -> the normalised mean embedding of its
+relevant assessments. At serve time a query embedding is then one sparse x dense product
+instead of averaging the embeddings of the top lexical documents.
+
+Before writing, k-fold cross-validation over the labeled queries (catalog documents are
+always in the training fold) reports recall@10 of `recommend()` with the projection and
+with the top-5 averaging it replaces.
+
+Outputs data/query_projection.npz: `terms` and `idf` of the TF-IDF vocabulary it was
+fitted on (the recommender ignores the file if its vectorizer differs, i.e. after a
+catalog change), `W` (terms x dim float32) and `bias` (dim).
+
+Run (from the `shl_recommender` folder): python data/fit_query_projection.py [--alpha 1.0]
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+from scipy import sparse
+from sklearn.linear_model import Ridge
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, '..'))
+
+import recommender  # noqa: E402
+
+LABELED = os.path.join(ROOT, 'train_remapped.json')
+OUT = os.path.join(ROOT, 'query_projection.npz')
+
+# evaluate the pipeline itself, not cached answers from a previous fold
+recommender._query_cache.maxsize = recommender._result_cache.maxsize = 0
+
+
+def load_labeled(path=LABELED):
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = json.load(f)
+    known = recommender._id_to_index
+    return [r for r in rows if r.get('query') and any(l in known for l in r.get('labels') or [])]
+
+
+def _targets(rows):
+    emb = recommender._emb_normed
+    out = np.empty((len(rows), emb.shape[1]), dtype=np.float32)
+    for i, r in enumerate(rows):
+        v = emb[[recommender._id_to_index[l] for l in r['labels'] if l in recommender._id_to_index]].mean(axis=0)
+        out[i] = v / (np.linalg.norm(v) + 1e-12)
+    return out
+
+
+def fit(rows, alpha=1.0):
+    """(W, bias) of a ridge map from TF-IDF to embedding space over catalog docs + `rows`."""
+    X = sparse.vstack([recommender._tfidf_doc_matrix,
+                       recommender._tfidf_vectorizer.transform([r['query'] for r in rows])]).tocsr()
+    Y = np.vstack([recommender._emb_normed, _targets(rows)])
+    model = Ridge(alpha=alpha).fit(X, Y)
+    return model.coef_.T.astype(np.float32), model.intercept_.astype(np.float32)
+
+
+def _as_file(W, bias):
+    vec = recommender._tfidf_vectorizer
+    return {'terms': vec.get_feature_names_out().astype(str), 'idf': vec.idf_, 'W': W, 'bias': bias}
+
+
+def recall_at_10(rows):
+    hits = total = 0
+    for r in rows:
+        labels = set(r['labels'])
+        preds = {p['assessment_id'] for p in recommender.recommend(r['query'], top_k=10)}
+        hits += len(labels & preds)
+        total += len(labels)
+    return hits / total if total else 0.0
+
+
+def cross_validate(rows, alpha=1.0, folds=5, seed=0):
+    """Held-out recall@10 as {"projection": ..., "averaging": ...}."""
+    saved = recommender._query_projection
+    parts = np.array_split(np.random.default_rng(seed).permutation(len(rows)), folds)
+    scores = {'projection': 0.0, 'averaging': 0.0}
+    try:
+        for part in parts:
+            held = set(part.tolist())
+            train = [r for i, r in enumerate(rows) if i not in held]
+            test = [rows[i] for i in part]
+            weight = len(test) / len(rows)
+            recommender._query_projection = recommender._check_query_projection(_as_file(*fit(train, alpha)))
+            scores['projection'] += weight * recall_at_10(test)
+            recommender._query_projection = None
+            scores['averaging'] += weight * recall_at_10(test)
+    finally:
+        recommender._query_projection = saved
+    return {k: round(v, 3) for k, v in scores.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit the TF-IDF -> embedding query projection.')
+    parser.add_argument('--alpha', type=float, default=1.0, help='ridge regularisation strength')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--out', default=OUT)
+    args = parser.parse_args()
+
+    if recommender._emb_normed is None:
+        raise SystemExit(f'Missing embeddings: {recommender.EMB_PATH}')
+    rows = load_labeled()
+    print(f'{len(recommender.raw_data)} catalog documents, {len(rows)} labeled queries')
+    if args.folds > 1:
+        print('held-out recall@10:', cross_validate(rows, args.alpha, args.folds))
+
+    W, bias = fit(rows, args.alpha)
+    np.savez_compressed(args.out, **_as_file(W, bias))
+    print(f'Wrote {W.shape[0]} x {W.shape[1]} projection to', args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Single-pass streaming ingestion of `dataset.xlsx`.
+
+Rows are streamed once per sheet with openpyxl in read-only mode (no DataFrame per
+sheet), labels are canonicalized to catalog `assessment_id`s in chunks through
+precomputed lookup tables (URL segment -> id, lowercased name -> id, then the shared
+fuzzy matcher for near-exact names; each distinct label is resolved once), and output
+rows are written as they are produced:
+
+ - train.jsonl / test.jsonl   one row per line
+ - train.json / test.json     same rows as JSON arrays (the format the rest of the repo reads)
+ - labeled.json / unlabeled.json   legacy views of the first sheet used by evaluate.py,
+   split with the original parser's column heuristics (a row is labeled only if a
+   label/gold/target column has a value)
+
+Memory stays flat in the number of spreadsheet rows apart from the label cache.
+Run via `python data/parse_dataset.py`.
+"""
+import json
+import os
+import sys
+
+import pandas as pd
+from openpyxl import load_workbook
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+XLSX = os.path.join(ROOT, 'dataset.xlsx')
+CATALOG_PATH = os.path.join(ROOT, 'shl_assessments.json')
+CHUNK_ROWS = 10000
+
+sys.path.insert(0, os.path.join(ROOT, '..'))
+from fuzzy_match import FuzzyMatcher, norm  # noqa: E402
+
+# near-exact name matches (case/punctuation differences) are canonicalized here;
+# anything looser is left UNMAPPED for remap_unmapped_labels.py to review
+NAME_MATCH_THRESHOLD = 0.95
+
+
+def find_query_column(cols):
+    q_candidates = [c for c in cols if any(k in c.lower() for k in ("query", "text", "description", "jd", "job"))]
+    return q_candidates[0] if q_candidates else cols[0]
+
+
+def find_label_columns(cols):
+    label_keywords = ("label", "relev", "assessment", "assessment_url", "assessmenturl", "relevant")
+    return [c for c in cols if any(k in c.lower() for k in label_keywords)]
+
+
+def normalize_val(v):
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    if isinstance(v, str):
+        s = v.strip()
+        return s if s != "" else None
+    return str(v)
+
+
+def iter_sheets(path):
+    """Yield (sheet name, column names, row iterator) streaming each sheet once, read-only."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            # same names pandas gives unnamed columns
+            cols = [str(h).strip() if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+            yield ws.title, cols, rows
+    finally:
+        wb.close()
+
+
+class LabelCanonicalizer:
+    """Maps raw labels (URLs or names) to assessment ids; unresolved become `UNMAPPED:<label>`."""
+
+    def __init__(self, catalog_items):
+        self.catalog_ids = {}
+        self.name_to_id = {}
+        for item in catalog_items:
+            aid = item.get('assessment_id') or (item.get('url') or '').rstrip('/').split('/')[-1]
+            if not aid:
+                continue
+            self.catalog_ids[aid] = aid
+            name = (item.get('description') or '').strip().lower()
+            if name:
+                self.name_to_id[name] = aid
+        self._matcher = None
+        self._cache = {}
+
+    @classmethod
+    def from_catalog(cls, path=CATALOG_PATH):
+        items = []
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    items = json.load(f).get('recommended_assessments', [])
+            except Exception:
+                pass
+        return cls(items)
+
+    def _fuzzy(self, label):
+        if self._matcher is None:
+            self._matcher = FuzzyMatcher((aid, norm(name)) for name, aid in self.name_to_id.items())
+        aid, score = self._matcher.best(norm(label))
+        return aid if aid and score >= NAME_MATCH_THRESHOLD else None
+
+    def canonicalize(self, labels):
+        """Canonical ids for a list of stripped labels, in order."""
+        new = pd.unique(pd.Series([l for l in labels if l not in self._cache], dtype=object))
+        if len(new):
+            s = pd.Series(new, dtype=object)
+            is_url = s.str.match(r'(?i)https?://')
+            # last path segment of URLs (query/fragment dropped, trailing slashes ignored)
+            seg = (s.str.replace(r'(?i)^https?://[^/?#]*', '', regex=True)
+                    .str.replace(r'[?#].*$', '', regex=True)
+                    .str.rstrip('/').str.rsplit('/', n=1).str[-1])
+            by_url = seg.where(is_url).map(self.catalog_ids)
+            by_name = s.str.lower().map(self.name_to_id)
+            resolved = by_url.fillna(by_name)
+            for label, url, aid in zip(new, is_url, resolved):
+                if not isinstance(aid, str) and not url:
+                    aid = self._fuzzy(label)
+                self._cache[label] = aid if isinstance(aid, str) else f"UNMAPPED:{label}"
+        return [self._cache[l] for l in labels]
+
+
+class _RowWriter:
+    """Writes rows to <name>.jsonl and a JSON array <name>.json incrementally.
+
+    The array is laid out exactly like `json.dump(rows, f, indent=2, ensure_ascii=False)`.
+    """
+
+    def __init__(self, out_dir, name, jsonl=True):
+        self.count = 0
+        self._json = open(os.path.join(out_dir, name + '.json'), 'w', encoding='utf8')
+        self._jsonl = open(os.path.join(out_dir, name + '.jsonl'), 'w', encoding='utf8') if jsonl else None
+
+    @staticmethod
+    def _indented(row):
+        # json.dumps(indent=) runs the pure-Python encoder; rows are flat (scalars and
+        # lists of scalars), so lay them out by hand around the C encoder instead
+        dumps = json.dumps
+        parts = []
+        for k, v in row.items():
+            if isinstance(v, list):
+                v = ('[\n      ' + ',\n      '.join(dumps(x, ensure_ascii=False) for x in v) + '\n    ]') if v else '[]'
+            elif isinstance(v, dict):
+                return json.dumps(row, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+            else:
+                v = dumps(v, ensure_ascii=False)
+            parts.append(f'{dumps(k, ensure_ascii=False)}: {v}')
+        return ('{\n    ' + ',\n    '.join(parts) + '\n  }') if parts else '{}'
+
+    def write(self, row):
+        block = self._indented(row)
+        self._json.write(('[\n  ' if self.count == 0 else ',\n  ') + block)
+        if self._jsonl is not None:
+            self._jsonl.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.count += 1
+
+    def close(self):
+        self._json.write('\n]' if self.count else '[]')
+        self._json.close()
+        if self._jsonl is not None:
+            self._jsonl.close()
+
+
+def _legacy_columns(cols):
+    """(query, id, label) column positions picked like the original labeled/unlabeled parser."""
+    q_idx = id_idx = label_idx = None
+    for i, c in enumerate(cols):
+        k = c.lower()
+        if 'query' in k or 'text' in k or 'job' in k:
+            q_idx = i
+        if k in ('id', 'identifier'):
+            id_idx = i
+        if 'label' in k or 'gold' in k or 'target' in k:
+            label_idx = i
+    return q_idx, id_idx, label_idx
+
+
+def _legacy_row(row, legacy_cols):
+    """('labeled' | 'unlabeled', record) for a first-sheet row, or None without a query."""
+    query, rid, labels = (row[i] if i is not None and i < len(row) else None for i in legacy_cols)
+    if not query:
+        return None
+    if labels:
+        if isinstance(labels, str):
+            labels = [x.strip() for x in labels.replace(';', ',').split(',') if x.strip()]
+        else:
+            labels = [str(labels)]
+        return 'labeled', {"query": str(query).strip(), "labels": labels}
+    return 'unlabeled', {"id": rid, "query": str(query).strip()}
+
+
+def _split_labels(row, label_idx):
+    labels = []
+    for i in label_idx:
+        v = normalize_val(row[i]) if i < len(row) else None
+        if not v:
+            continue
+        # If comma-separated string, split
+        if isinstance(v, str) and "," in v:
+            labels.extend(p.strip() for p in v.split(",") if p.strip())
+        else:
+            labels.append(v)
+    # dedupe labels while preserving order
+    return list(dict.fromkeys(labels))
+
+
+def ingest(xlsx=XLSX, out_dir=ROOT, chunk_rows=CHUNK_ROWS, canonicalizer=None):
+    """Stream `xlsx` into the train/test outputs; returns (train rows, test rows)."""
+    canonicalizer = canonicalizer or LabelCanonicalizer.from_catalog()
+    os.makedirs(out_dir, exist_ok=True)
+    writers = {name: _RowWriter(out_dir, name) for name in ('train', 'test')}
+    writers['labeled'] = _RowWriter(out_dir, 'labeled', jsonl=False)
+    writers['unlabeled'] = _RowWriter(out_dir, 'unlabeled', jsonl=False)
+
+    def flush(chunk, sheet):
+        # one vectorized canonicalization per chunk
+        flat = canonicalizer.canonicalize([l.strip() for _, cleaned in chunk for l in cleaned])
+        pos = 0
+        for query, cleaned in chunk:
+            mapped = flat[pos:pos + len(cleaned)]
+            pos += len(cleaned)
+            writers['train'].write({"query": query, "labels": mapped, "raw_labels": cleaned, "source_sheet": sheet})
+        chunk.clear()
+
+    try:
+        for n_sheet, (sheet, cols, rows) in enumerate(iter_sheets(xlsx)):
+            label_idx = [cols.index(c) for c in find_label_columns(cols)]
+            q_idx = cols.index(find_query_column(cols))
+            legacy_cols = _legacy_columns(cols) if n_sheet == 0 else None
+            chunk = []
+            for row in rows:
+                if legacy_cols is not None:
+                    legacy = _legacy_row(row, legacy_cols)
+                    if legacy is not None:
+                        writers[legacy[0]].write(legacy[1])
+                query = normalize_val(row[q_idx]) if q_idx < len(row) else None
+                if not query:
+                    continue
+                if label_idx:
+                    chunk.append((query, _split_labels(row, label_idx)))
+                    if len(chunk) >= chunk_rows:
+                        flush(chunk, sheet)
+                else:
+                    writers['test'].write({"query": query, "source_sheet": sheet})
+            if chunk:
+                flush(chunk, sheet)
+    finally:
+        for w in writers.values():
+            w.close()
+    return writers['train'].count, writers['test'].count
@@ -1,9 +1,12 @@
-import pandas as pd
+from itertools import islice
 
-fn = "data/dataset.xlsx"
-xls = pd.ExcelFile(fn)
-print("Sheets:", xls.sheet_names)
-for sheet in xls.sheet_names:
-    df = pd.read_excel(fn, sheet_name=sheet)
+from ingest_dataset import XLSX, iter_sheets
+
+# one pass over the workbook: keep each sheet's header and first rows
+sheets = [(name, cols, list(islice(rows, 10))) for name, cols, rows in iter_sheets(XLSX)]
+print("Sheets:", [name for name, _, _ in sheets])
+for sheet, cols, rows in sheets:
     print(f"--- Sheet: {sheet} ---")
-    print(df.head(10))
+    print(cols)
+    for row in rows:
+        print(row)
@@ -4,8 +4,7 @@ Creates `data/train_remapped.json` and `data/remap_report.json`.
 """
 import json
 import os
-import re
-from difflib import SequenceMatcher
+import sys
 
 ROOT = os.path.dirname(__file__)
 TRAIN_IN = os.path.join(ROOT, 'train.json')
@@ -13,27 +12,19 @@ TRAIN_OUT = os.path.join(ROOT, 'train_remapped.json')
 REPORT_OUT = os.path.join(ROOT, 'remap_report.json')
 CATALOG = os.path.join(ROOT, 'shl_assessments.json')
 
-def norm(s):
-    if not s:
-        return ''
-    s = s.lower()
-    s = re.sub(r'[^0-9a-z ]+', ' ', s)
-    s = re.sub(r'\s+', ' ', s).strip()
-    return s
+sys.path.insert(0, os.path.join(ROOT, '..'))
+from fuzzy_match import FuzzyMatcher, norm, url_segment  # noqa: E402
 
 def best_match(label, candidates):
-    best_id = None
-    best_score = 0.0
-    for aid, text in candidates.items():
-        score = SequenceMatcher(None, label, text).ratio()
-        if score > best_score:
-            best_score = score
-            best_id = aid
-    return best_id, best_score
+    """Best (assessment_id, SequenceMatcher ratio) for a normalised label.
+
+    `candidates` is a FuzzyMatcher over normalised descriptions (see `load_catalog`).
+    """
+    return candidates.best(label)
 
 def load_catalog():
     if not os.path.exists(CATALOG):
-        return {}
+        return FuzzyMatcher([])
     with open(CATALOG, 'r', encoding='utf-8') as f:
         data = json.load(f).get('recommended_assessments', [])
     cand = {}
@@ -43,7 +34,7 @@ def load_catalog():
             continue
         desc = it.get('description') or ''
         cand[aid] = norm(desc)
-    return cand
+    return FuzzyMatcher(cand.items())
 
 def main(threshold=0.4):
     if not os.path.exists(TRAIN_IN):
@@ -53,6 +44,7 @@ def main(threshold=0.4):
         rows = json.load(f)
 
     candidates = load_catalog()
+    catalog_ids = set(candidates.keys)
     remapped = []
     report = {'remapped': [], 'unresolved': []}
     for ex in rows:
@@ -66,16 +58,10 @@ def main(threshold=0.4):
                 # first try exact match by last URL segment if original looks like a URL
                 best_id = None
                 score = 0.0
-                try:
-                    from urllib.parse import urlparse
-                    up = urlparse(original)
-                    if up.scheme in ('http', 'https'):
-                        seg = (up.path or '').rstrip('/').split('/')[-1]
-                        if seg in candidates:
-                            best_id = seg
-                            score = 1.0
-                except Exception:
-                    pass
+                seg = url_segment(original)
+                if seg and seg in catalog_ids:
+                    best_id = seg
+                    score = 1.0
                 if best_id is None:
                     best_id, score = best_match(lbl, candidates)
                 if best_id and score >= threshold:
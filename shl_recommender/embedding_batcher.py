@@ -0,0 +1,230 @@
+"""Dynamic micro-batching for query embeddings, in-process or as a Unix socket sidecar.
+
+`MicroBatcher` collects concurrent `submit()` calls on a queue; a single worker thread
+takes the first waiting item, keeps collecting until `max_batch` items or `max_wait_ms`
+after that first item, runs the batch function once and hands every caller its own
+result (or the batch's exception). Queue depth, batch sizes and per-item queue time are
+exported as `shl_batcher_*` metrics.
+
+`SHL_EMBED_BATCHING` selects how the recommender encodes queries:
+  (empty)            encode inline, one query at a time (default)
+  inproc             through a MicroBatcher in the serving process
+  unix:/path/sock    through the sidecar listening on that socket
+
+When the sidecar cannot be reached, reports an error or sends a malformed reply the
+recommender encodes inline and counts the failure in
+`shl_errors_total{stage="embedding_batcher"}`.
+
+The sidecar loads the same catalog files and serves newline-delimited JSON: requests
+`{"text": ...}`, responses `{"embedding": <base64 float32> | null}` or `{"error": ...}`.
+
+Run (from the `shl_recommender` folder):
+  python embedding_batcher.py --socket /tmp/shl_embed.sock --max-batch 64 --max-wait-ms 2
+"""
+import argparse
+import base64
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import threading
+import time
+
+import numpy as np
+
+import metrics
+
+EMBED_BATCHING = os.environ.get('SHL_EMBED_BATCHING', '')
+MAX_BATCH = int(os.environ.get('SHL_EMBED_MAX_BATCH', '32'))
+MAX_WAIT_MS = float(os.environ.get('SHL_EMBED_MAX_WAIT_MS', '2'))
+
+QUEUE_DEPTH = metrics.Gauge('shl_batcher_queue_depth', 'Items waiting in a micro-batcher queue.', ['batcher'])
+BATCH_SIZE = metrics.Histogram('shl_batcher_batch_size', 'Items per executed micro-batch.', ['batcher'],
+                               buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+QUEUE_SECONDS = metrics.Histogram('shl_batcher_queue_seconds', 'Time an item waited before its batch ran.',
+                                  ['batcher'])
+
+
+class _Slot:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Run `batch_fn(items) -> results` over concurrently submitted items."""
+
+    def __init__(self, name, batch_fn, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f'batcher-{name}', daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        slot = _Slot()
+        self._queue.put((item, slot, time.perf_counter()))
+        QUEUE_DEPTH.set(self._queue.qsize(), batcher=self.name)
+        slot.done.wait()
+        if slot.error is not None:
+            raise slot.error
+        return slot.result
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            now = time.perf_counter()
+            QUEUE_DEPTH.set(self._queue.qsize(), batcher=self.name)
+            BATCH_SIZE.observe(len(batch), batcher=self.name)
+            for _, _, enqueued in batch:
+                QUEUE_SECONDS.observe(now - enqueued, batcher=self.name)
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f'{self.name}: batch function returned {len(results)} results '
+                                       f'for {len(batch)} items')
+                for (_, slot, _), result in zip(batch, results):
+                    slot.result = result
+            except Exception as e:
+                for _, slot, _ in batch:
+                    slot.error = e
+            for _, slot, _ in batch:
+                slot.done.set()
+
+
+def _encode_vector(v):
+    return None if v is None else base64.b64encode(np.asarray(v, dtype='<f4').tobytes()).decode('ascii')
+
+
+def _decode_vector(s):
+    return None if s is None else np.frombuffer(base64.b64decode(s), dtype='<f4').copy()
+
+
+class UnixSocketClient:
+    """Client side of the sidecar; one connection per calling thread."""
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            conn = self._local.conn = (sock, sock.makefile('rwb'))
+        return conn
+
+    def submit(self, text):
+        for attempt in (0, 1):
+            try:
+                _, f = self._conn()
+                f.write(json.dumps({'text': text}).encode('utf-8') + b'\n')
+                f.flush()
+                line = f.readline()
+                if not line:
+                    raise ConnectionError('embedding sidecar closed the connection')
+                break
+            except OSError:
+                # stale connection (sidecar restarted): reconnect once
+                self._local.conn = None
+                if attempt:
+                    raise
+        reply = json.loads(line)
+        if not isinstance(reply, dict):
+            raise ValueError(f'malformed embedding sidecar reply: {line[:80]!r}')
+        if 'error' in reply:
+            raise RuntimeError(f"embedding sidecar: {reply['error']}")
+        return _decode_vector(reply.get('embedding'))
+
+
+def make_encoder(mode, batch_fn):
+    """An object with `submit(text)` for `mode` (see SHL_EMBED_BATCHING), or None for inline."""
+    if not mode:
+        return None
+    if mode == 'inproc':
+        return MicroBatcher('query_embedding', batch_fn)
+    if mode.startswith('unix:'):
+        return UnixSocketClient(mode[len('unix:'):])
+    raise ValueError(f'unknown SHL_EMBED_BATCHING mode: {mode!r}')
+
+
+def serve(path, batch_fn, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+    """Serve `batch_fn` on a Unix socket until interrupted."""
+    batcher = MicroBatcher('sidecar', batch_fn, max_batch, max_wait_ms)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    reply = {'embedding': _encode_vector(batcher.submit(json.loads(line)['text']))}
+                except Exception as e:
+                    reply = {'error': str(e)}
+                self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+                self.wfile.flush()
+
+    class Server(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+        request_queue_size = 256  # every serving thread holds one connection
+
+    if os.path.exists(path):
+        os.remove(path)
+    with Server(path, Handler) as server:
+        print(f'Embedding sidecar on {path} (max batch {max_batch}, max wait {max_wait_ms} ms)')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            batcher.close()
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-batching query embedding sidecar.')
+    parser.add_argument('--socket', default='/tmp/shl_embed.sock')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # clean up the socket file on TERM too
+    import recommender
+    recommender._embedder = None  # the sidecar itself always encodes in-process
+    serve(args.socket, recommender.project_queries, args.max_batch, args.max_wait_ms)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Indexed fuzzy string matching for mapping dataset labels to catalog assessments.
+
+Comparing every label against every catalog entry with `difflib.SequenceMatcher` is
+O(labels x catalog) with an expensive inner ratio. `FuzzyMatcher` indexes the choices
+by character trigrams; a query counts shared trigrams through the inverted index to
+shortlist the closest choices, and only the shortlist gets the exact
+`SequenceMatcher.ratio()` (with the cheap upper bounds checked first).
+
+Shared by data/parse_dataset.py, data/remap_unmapped_labels.py and
+scripts/auto_remap_unmapped.py.
+"""
+import re
+from difflib import SequenceMatcher
+from urllib.parse import urlparse
+
+import numpy as np
+
+SHORTLIST = 50
+
+
+def norm(s):
+    """Lowercase, keep only [0-9a-z ] and collapse whitespace."""
+    if not s:
+        return ''
+    s = s.lower()
+    s = re.sub(r'[^0-9a-z ]+', ' ', s)
+    s = re.sub(r'\s+', ' ', s).strip()
+    return s
+
+
+def url_segment(label):
+    """Last path segment of `label` if it is an http(s) URL, else None."""
+    try:
+        up = urlparse(label)
+    except Exception:
+        return None
+    if up.scheme in ('http', 'https'):
+        return (up.path or '').rstrip('/').split('/')[-1]
+    return None
+
+
+def trigrams(s):
+    padded = f'  {s} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyMatcher:
+    """Best `SequenceMatcher` match of a query among fixed choices, via a trigram index.
+
+    `choices` is an iterable of (key, text) pairs; a key may appear with several texts
+    (e.g. an assessment id and its description) and scores as its best text. Texts are
+    compared as given, so normalise them the same way as the queries.
+    """
+
+    def __init__(self, choices, shortlist=SHORTLIST):
+        self.shortlist = shortlist
+        self.keys = []
+        self.texts = []
+        postings = {}
+        for key, text in choices:
+            text = text or ''
+            self.texts.append(text)
+            self.keys.append(key)
+            doc = len(self.texts) - 1
+            for g in trigrams(text):
+                postings.setdefault(g, []).append(doc)
+        self._postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+        self._n_grams = np.asarray([len(trigrams(t)) for t in self.texts], dtype=np.float64)
+        self._matchers = [None] * len(self.texts)
+
+    def _matcher(self, pos):
+        # SequenceMatcher caches its index of the second sequence, so keep one per choice
+        sm = self._matchers[pos]
+        if sm is None:
+            sm = self._matchers[pos] = SequenceMatcher(None, '', self.texts[pos])
+        return sm
+
+    def candidates(self, query):
+        """Positions of the choices sharing the most trigrams with `query` (Dice), best first.
+
+        Empty when no choice shares a trigram: such a query has no real match, and scoring
+        it against every choice would bring back the full linear scan.
+        """
+        grams = [g for g in trigrams(query) if g in self._postings]
+        n = len(self.texts)
+        if not grams:
+            return np.empty(0, dtype=np.int64)
+        if self.shortlist >= n:
+            return np.arange(n)
+        shared = np.bincount(np.concatenate([self._postings[g] for g in grams]), minlength=n)
+        dice = 2.0 * shared / (len(trigrams(query)) + self._n_grams)
+        top = np.argpartition(-dice, self.shortlist - 1)[:self.shortlist]
+        return top[np.lexsort((top, -dice[top]))]
+
+    def best(self, query):
+        """(key, ratio) of the best match, (None, 0.0) when there are no choices.
+
+        Ties go to the choice listed first, like a linear scan keeping the first maximum.
+        """
+        best_pos, best_score = None, 0.0
+        for pos in sorted(self.candidates(query)):
+            sm = self._matcher(pos)
+            sm.set_seq1(query)
+            # cheap upper bounds first; only a strictly better ratio can replace the best
+            if sm.real_quick_ratio() <= best_score or sm.quick_ratio() <= best_score:
+                continue
+            score = sm.ratio()
+            if score > best_score:
+                best_pos, best_score = pos, score
+        if best_pos is None:
+            return None, 0.0
+        return self.keys[best_pos], best_score
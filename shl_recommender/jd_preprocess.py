@@ -0,0 +1,120 @@
+"""Bounding and chunking of job-description text before scoring.
+
+URL extractions can be hundreds of KB of page boilerplate, and every scoring stage
+(BM25, skill matching, level regexes) is linear in the JD length. `prepare()` caps the
+input, and when it is over the token budget keeps the sections that describe the job
+(requirements, responsibilities, skills...) ahead of boilerplate (benefits, about us,
+legal), then splits the kept text into chunks so dense similarity can be computed per
+chunk and aggregated instead of averaging one embedding over the whole page. Inputs
+within the budget are passed through as a single chunk.
+
+Sections are found on line breaks; text without them (HTML extracted with a space
+separator) is split into sentences first, so "Requirements:" still starts a section.
+
+Limits (env): SHL_MAX_JD_CHARS, SHL_MAX_JD_TOKENS, SHL_JD_CHUNK_TOKENS.
+"""
+import os
+import re
+
+MAX_JD_CHARS = int(os.environ.get('SHL_MAX_JD_CHARS', '100000'))     # hard cap before any parsing
+MAX_JD_TOKENS = int(os.environ.get('SHL_MAX_JD_TOKENS', '1500'))    # whitespace tokens kept for scoring
+CHUNK_TOKENS = int(os.environ.get('SHL_JD_CHUNK_TOKENS', '512'))    # tokens per dense-scoring chunk
+
+_HEADING_MAX_WORDS = 8
+_LONG_LINE_WORDS = 100  # longer "lines" are split into sentences before looking for headings
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?:;])\s+")
+# matched against lowercased lines (much faster than re.I on long pages)
+_KEEP_RE = re.compile(r"requirement|qualification|responsibilit|skill|duties|experience|what you.?ll do|"
+                      r"what we.?re looking for|about the (role|job|position)|must.have|nice.to.have|"
+                      r"competenc|role|profile|you will|you have")
+_DROP_RE = re.compile(r"benefit|perk|about us|about the company|who we are|our (company|culture|values)|"
+                      r"equal opportunit|diversity|privacy|cookie|how to apply|apply now|salary|compensation|"
+                      r"disclaimer|legal|share this|similar jobs|related jobs")
+
+
+class PreparedJD:
+    """Bounded JD text plus the chunks used for dense scoring."""
+
+    def __init__(self, text, chunks, n_tokens, truncated):
+        self.text = text
+        self.chunks = chunks
+        self.n_tokens = n_tokens
+        self.truncated = truncated
+
+
+def _is_heading(line):
+    words = line.split()
+    if not 0 < len(words) <= _HEADING_MAX_WORDS:
+        return False
+    if line.rstrip().endswith(':'):
+        return True
+    line = line.lower()
+    return bool(_KEEP_RE.search(line) or _DROP_RE.search(line))
+
+
+def _lines(text):
+    for line in text.splitlines():
+        if len(line.split()) > _LONG_LINE_WORDS:
+            yield from _SENTENCE_END_RE.split(line)
+        else:
+            yield line
+
+
+def split_sections(text):
+    """Split text into (heading, lines) sections on short heading-like lines."""
+    sections = [('', [])]
+    for line in _lines(text):
+        if not line.strip():
+            continue
+        if _is_heading(line):
+            sections.append((line.strip(), []))
+        else:
+            sections[-1][1].append(line.strip())
+    return [(h, body) for h, body in sections if h or body]
+
+
+def _priority(heading):
+    heading = heading.lower()
+    if _DROP_RE.search(heading):
+        return 2
+    if _KEEP_RE.search(heading):
+        return 0
+    return 1
+
+
+def _select_sections(text, budget):
+    """Keep job-describing sections first, then neutral ones, within `budget` tokens.
+
+    Boilerplate sections are only used when the page has nothing else.
+    """
+    sections = split_sections(text)
+    order = sorted(range(len(sections)), key=lambda i: (_priority(sections[i][0]), i))
+    if any(_priority(sections[i][0]) < 2 for i in order):
+        order = [i for i in order if _priority(sections[i][0]) < 2]
+    kept = {}
+    remaining = budget
+    for i in order:
+        if remaining <= 0:
+            break
+        heading, body = sections[i]
+        words = (heading + ' ' + ' '.join(body)).split()
+        kept[i] = words[:remaining]
+        remaining -= len(kept[i])
+    # reassemble in document order
+    return [w for i in sorted(kept) for w in kept[i]]
+
+
+def chunk_tokens(tokens, size=None):
+    size = size or CHUNK_TOKENS
+    return [' '.join(tokens[i:i + size]) for i in range(0, len(tokens), size)] or ['']
+
+
+def prepare(text, max_tokens=None, chunk_size=None):
+    """Bound `text` to the token budget and chunk it; inputs within the budget pass through unchanged."""
+    max_tokens = max_tokens or MAX_JD_TOKENS
+    text = (text or '')[:MAX_JD_CHARS]
+    tokens = text.split()
+    if len(tokens) <= max_tokens:
+        return PreparedJD(text, [text], len(tokens), False)
+    tokens = _select_sections(text, max_tokens)
+    return PreparedJD(' '.join(tokens), chunk_tokens(tokens, chunk_size), len(tokens), True)
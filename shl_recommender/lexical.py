@@ -0,0 +1,91 @@
+"""BM25 lexical retrieval over the catalog documents.
+
+A term -> postings inverted index with the BM25 impact of every (term, document)
+pair precomputed at build time. A query only touches the postings of its own terms,
+so its cost tracks the query vocabulary rather than the catalog size. Terms found in
+more than `max_df` of the documents are not indexed: their postings would cover most
+of the catalog while their idf is close to zero.
+"""
+import re
+from collections import Counter
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+# same token pattern and stop words as the TF-IDF vectorizer in recommender.py
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+
+def tokenize(text: str):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in ENGLISH_STOP_WORDS]
+
+
+class BM25Index:
+    """Inverted index with precomputed BM25 impacts.
+
+    `postings[term]` is a pair of aligned arrays: document ids (int32) and the term's
+    BM25 contribution to each of those documents (float32).
+    """
+
+    def __init__(self, documents, k1=1.2, b=0.75, max_df=0.5):
+        self.k1 = k1
+        self.b = b
+        self.max_df = max_df
+        self.n_docs = len(documents)
+        doc_terms = [Counter(tokenize(d)) for d in documents]
+        lengths = np.array([sum(c.values()) for c in doc_terms], dtype=np.float64)
+        avgdl = lengths.mean() if self.n_docs else 0.0
+
+        raw = {}
+        for doc_id, counts in enumerate(doc_terms):
+            for term, tf in counts.items():
+                raw.setdefault(term, ([], []))
+                raw[term][0].append(doc_id)
+                raw[term][1].append(tf)
+
+        norm = k1 * (1.0 - b + b * lengths / avgdl) if avgdl else np.full(self.n_docs, k1)
+        self.postings = {}
+        for term, (ids, tfs) in raw.items():
+            ids = np.asarray(ids, dtype=np.int32)
+            tfs = np.asarray(tfs, dtype=np.float64)
+            df = len(ids)
+            if self.n_docs > 1 and df > max_df * self.n_docs:
+                continue
+            idf = np.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5))
+            impact = idf * tfs * (k1 + 1.0) / (tfs + norm[ids])
+            self.postings[term] = (ids, impact.astype(np.float32))
+
+    def scores(self, query: str, allowed=None):
+        """Sparse BM25 scores: (doc ids, scores) for documents sharing a query term.
+
+        `allowed` is an optional boolean mask over documents (e.g. active filters).
+        """
+        qtf = Counter(t for t in tokenize(query) if t in self.postings)
+        if not qtf:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        if len(qtf) == 1:
+            (term, mult), = qtf.items()
+            ids, impact = self.postings[term]
+            doc_ids, totals = ids, impact * mult
+        else:
+            ids = np.concatenate([self.postings[t][0] for t in qtf])
+            weights = np.concatenate([self.postings[t][1] * m for t, m in qtf.items()])
+            doc_ids, inverse = np.unique(ids, return_inverse=True)
+            totals = np.bincount(inverse, weights=weights).astype(np.float32)
+        if allowed is not None:
+            keep = allowed[doc_ids]
+            doc_ids, totals = doc_ids[keep], totals[keep]
+        return doc_ids, totals
+
+    def top_k(self, query: str, k: int, allowed=None):
+        """Best `k` (doc id, score) pairs, highest first; empty when no term matches."""
+        if k <= 0:
+            return []
+        doc_ids, totals = self.scores(query, allowed)
+        if k < len(totals):
+            # threshold at the k-th best score, then order; ties go to the lower doc id
+            kth = totals[np.argpartition(-totals, k - 1)[k - 1]]
+            keep = np.flatnonzero(totals >= kth)
+            doc_ids, totals = doc_ids[keep], totals[keep]
+        best = np.lexsort((doc_ids, -totals))[:k]
+        return [(int(doc_ids[i]), float(totals[i])) for i in best]
@@ -1,13 +1,42 @@
+import hashlib
+import json
 import os
+import time
+from contextlib import asynccontextmanager
+import anyio
 import uvicorn
 import requests
 from bs4 import BeautifulSoup
-from fastapi import FastAPI, HTTPException
-from models import RecommendationRequest, RecommendationResponse
-from recommender import recommend, recommend_balanced
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from models import BatchRecommendationRequest, PagedRecommendationRequest, RecommendationRequest, RecommendationResponse
+import metrics
+import pagination
+import profiling
+import recommender
+import scheduler
+import serialization
+import warmup
+from cache import SingleFlight
+from recommender import recommend, recommend_balanced, recommend_lexical
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
-app = FastAPI()
+# Replay known queries before /ready reports OK (SHL_WARMUP=0 skips it); /health is
+# liveness only and answers immediately.
+readiness = warmup.Readiness()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # sync endpoints run on this pool; scheduler.QUEUE_LIMITS are sized to stay below it
+    anyio.to_thread.current_default_thread_limiter().total_tokens = scheduler.THREADPOOL_SIZE
+    readiness.start(enabled=os.environ.get("SHL_WARMUP", "1") != "0")
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow requests from your frontend (adjust the origin as needed)
 app.add_middleware(
@@ -18,73 +47,200 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip bodies over 1 KB when the client sends Accept-Encoding: gzip (SSE is left alone)
+app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=5)
+
+
+@app.middleware("http")
+async def count_requests(request: Request, call_next):
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+    except Exception:
+        status = "500"
+        metrics.ERRORS.inc(stage="unhandled")
+        raise
+    finally:
+        # label by route template so path parameters don't explode label cardinality
+        route = request.scope.get("route")
+        metrics.REQUESTS.inc(endpoint=getattr(route, "path", "unmatched"), status=status)
+    return response
+
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+
+@app.get("/ready")
+def readiness_check():
+    if not readiness.ready.is_set():
+        return Response(json.dumps({"status": "warming_up"}), status_code=503, media_type="application/json")
+    return {"status": "ready", "warmup": readiness.summary}
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+
+def extract_text_from_html(html: str) -> str:
+    """Pick the most useful job-description text out of a fetched page."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Try to extract the main article or job description text
+    text_candidates = []
+    article = soup.find("article")
+    if article:
+        text_candidates.append(article.get_text(separator=" ").strip())
+
+    # paragraphs
+    paragraphs = [p.get_text().strip() for p in soup.find_all("p") if p.get_text().strip()]
+    if paragraphs:
+        text_candidates.append(" \n".join(paragraphs))
+
+    # common meta description tags
+    meta_desc = None
+    meta = soup.find("meta", attrs={"name": "description"}) or soup.find("meta", attrs={"property": "og:description"})
+    if meta and meta.get("content"):
+        meta_desc = meta.get("content").strip()
+        text_candidates.append(meta_desc)
+
+    # fallback to full visible text
+    full_text = soup.get_text(separator=" ").strip()
+    if full_text:
+        text_candidates.append(full_text)
+
+    # pick the longest candidate (heuristic)
+    text_candidates = [t for t in text_candidates if t]
+    if not text_candidates:
+        raise ValueError("No extractable text found on the page")
+    return max(text_candidates, key=lambda s: len(s))
+
+
+# Concurrent identical requests (e.g. a popular posting URL shared widely) attach to the
+# in-flight fetch / scoring instead of repeating it.
+_fetch_flight = SingleFlight("url_fetch")
+_score_flight = SingleFlight("scoring")
+# priority lanes in front of scoring (scheduler.py): X-Priority / API key select the lane
+_lanes = scheduler.LaneScheduler()
+
+
+def _normalize_url(url: str) -> str:
+    return url.strip().split("#", 1)[0]
+
+
+def fetch_job_text(url: str) -> str:
+    with metrics.timed("url_fetch"):
+        resp = requests.get(url, timeout=10, headers=FETCH_HEADERS)
+        resp.raise_for_status()
+    with metrics.timed("html_extraction"):
+        return extract_text_from_html(resp.text)
+
+
+def _header_flag(request: Request, name: str) -> bool:
+    return (request.headers.get(name) or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _lane(request: Request) -> str:
+    return scheduler.lane_for(request.headers.get("x-api-key"), request.headers.get("x-priority"))
+
+
+def _scheduled(lane: str, fn):
+    try:
+        return _lanes.run(lane, fn)
+    except scheduler.Overloaded as e:
+        raise HTTPException(status_code=429, detail=f"Overloaded: {e}", headers={"Retry-After": "1"})
+
+
 @app.post("/recommend", response_model=RecommendationResponse)
-def recommend_assessments(payload: RecommendationRequest):
+def recommend_assessments(payload: RecommendationRequest, request: Request):
+    # X-Debug-Timing returns a per-stage breakdown; X-Profile (or the sampler) dumps a capture
+    debug = _header_flag(request, "x-debug-timing")
+    profile = profiling.should_profile(_header_flag(request, "x-profile"))
+    meta = {"url": payload.url, "balanced": bool(payload.balanced), "top_k": payload.top_k,
+            # captures sit on disk: identify the JD without storing its text
+            "job_description_sha256": hashlib.sha256((payload.job_description or "").encode("utf-8")).hexdigest(),
+            "job_description_chars": len(payload.job_description or "")}
+    with profiling.request_trace("recommend", enabled=debug, profile=profile, meta=meta) as trace:
+        results = _run_recommendation(payload, lane=_lane(request))
+        with metrics.timed("serialization"):
+            if debug:
+                response = RecommendationResponse(recommended_assessments=results)
+                response.debug = {"trace_id": trace.id, "stages_ms": trace.breakdown(),
+                                  "total_ms": round((time.perf_counter() - trace.t0) * 1e3, 3), **trace.attrs}
+                body = response.model_dump_json()
+            else:
+                body = _results_json(results)
+    headers = {"X-Trace-Id": trace.id} if trace is not None else None
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _resolve_job_text(payload: RecommendationRequest) -> str:
     text = None
     if payload.url:
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            }
-            resp = requests.get(payload.url, timeout=10, headers=headers)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-
-            # Try to extract the main article or job description text
-            text_candidates = []
-            article = soup.find("article")
-            if article:
-                text_candidates.append(article.get_text(separator=" ").strip())
-
-            # paragraphs
-            paragraphs = [p.get_text().strip() for p in soup.find_all("p") if p.get_text().strip()]
-            if paragraphs:
-                text_candidates.append(" \n".join(paragraphs))
-
-            # common meta description tags
-            meta_desc = None
-            meta = soup.find("meta", attrs={"name": "description"}) or soup.find("meta", attrs={"property": "og:description"})
-            if meta and meta.get("content"):
-                meta_desc = meta.get("content").strip()
-                text_candidates.append(meta_desc)
-
-            # fallback to full visible text
-            full_text = soup.get_text(separator=" ").strip()
-            if full_text:
-                text_candidates.append(full_text)
-
-            # pick the longest candidate (heuristic)
-            text_candidates = [t for t in text_candidates if t]
-            if text_candidates:
-                text = max(text_candidates, key=lambda s: len(s))
-            else:
-                raise ValueError("No extractable text found on the page")
+            url = _normalize_url(payload.url)
+            text = _fetch_flight.do(url, lambda: fetch_job_text(url))
         except Exception as e:
+            metrics.ERRORS.inc(stage="url_fetch")
             # Return a clear structured error so frontend can display it
             raise HTTPException(status_code=400, detail=f"Failed to fetch or parse URL: {str(e)}")
 
     # Prefer explicit job_description if provided
     job_text = payload.job_description or text
     if not job_text:
+        metrics.ERRORS.inc(stage="validation")
         raise HTTPException(status_code=400, detail="Either `job_description` or `url` must be provided")
+    warmup.record_query(job_text)
+    return job_text
+
 
+def _clamp_top_k(payload: RecommendationRequest) -> int:
     top_k = payload.top_k or 10
     # enforce sensible bounds (min 5, max 10)
     if top_k < 1:
         top_k = 10
     if top_k > 10:
         top_k = 10
+    return top_k
+
+
+def _filters(payload: RecommendationRequest) -> dict:
+    return {
+        "exclude_prepackaged": payload.exclude_prepackaged,
+        "max_duration": payload.max_duration,
+        "remote_support": payload.remote_support,
+        "adaptive_support": payload.adaptive_support,
+        "test_types": payload.test_types,
+    }
+
+
+def _run_recommendation(payload: RecommendationRequest, job_text: str = None, lane: str = scheduler.INTERACTIVE):
+    if job_text is None:
+        job_text = _resolve_job_text(payload)
+    top_k = _clamp_top_k(payload)
 
     # Collect tuning params if provided (fallback to recommender defaults)
     w_skill = payload.w_skill if payload.w_skill is not None else None
     w_embed = payload.w_embed if payload.w_embed is not None else None
     w_diff = payload.w_diff if payload.w_diff is not None else None
     prefer_ratio = payload.prefer_ratio if payload.prefer_ratio is not None else 0.5
+    filters = _filters(payload)
+    filters["candidate_n"] = payload.candidate_n
+    # per lane: an interactive request must not wait in (or be shed with) a bulk leader
+    key = (lane, job_text, top_k, bool(payload.balanced), w_skill, w_embed, w_diff, prefer_ratio,
+           tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in filters.items())))
+    return _score_flight.do(key, lambda: _scheduled(lane, lambda: _score_payload(
+        payload, job_text, top_k, w_skill, w_embed, w_diff, prefer_ratio, filters)))
+
 
+def _score_payload(payload, job_text, top_k, w_skill, w_embed, w_diff, prefer_ratio, filters):
     # Choose the recommendation function based on the `balanced` flag
     if payload.balanced:
         results = recommend_balanced(
@@ -94,7 +250,7 @@ def recommend_assessments(payload: RecommendationRequest):
             w_embed=w_embed if w_embed is not None else 0.4,
             w_diff=w_diff if w_diff is not None else 0.0,
             prefer_ratio=prefer_ratio,
-            exclude_prepackaged=payload.exclude_prepackaged,
+            **filters,
         )
     else:
         results = recommend(
@@ -103,10 +259,138 @@ def recommend_assessments(payload: RecommendationRequest):
             w_skill=w_skill if w_skill is not None else 0.6,
             w_embed=w_embed if w_embed is not None else 0.4,
             w_diff=w_diff if w_diff is not None else 0.0,
-            exclude_prepackaged=payload.exclude_prepackaged,
+            **filters,
         )
+    return results
+
+
+def _results_json(results) -> str:
+    # spliced from per-snapshot pre-rendered item fragments; same bytes as the model
+    return serialization.render_results(results)
+
+
+def _page_response(items, next_cursor, total):
+    body = _results_json(items)
+    return Response(body[:-1] + ',"next_cursor":%s,"total":%d}' % (json.dumps(next_cursor), total),
+                    media_type="application/json")
+
+
+def _page_size(page_size) -> int:
+    return min(max(page_size or 10, 1), pagination.MAX_PAGE_SIZE)
+
+
+@app.post("/recommend/pages")
+def recommend_first_page(payload: PagedRecommendationRequest, request: Request):
+    """First page of the full ranking plus a `next_cursor` for GET /recommend/pages/{cursor}.
+
+    The ranking is computed once and cached (SHL_CURSOR_TTL_S); later pages are slices.
+    Scores are stored as float16. `balanced` isn't supported for paging.
+    """
+    job_text = _resolve_job_text(payload)
+    items, next_cursor, total = _scheduled(_lane(request), lambda: pagination.first_page(
+        job_text, _page_size(payload.page_size),
+        w_skill=payload.w_skill if payload.w_skill is not None else 0.6,
+        w_embed=payload.w_embed if payload.w_embed is not None else 0.4,
+        w_diff=payload.w_diff if payload.w_diff is not None else 0.0,
+        candidate_n=payload.candidate_n,
+        **_filters(payload),
+    ))
+    return _page_response(items, next_cursor, total)
+
+
+@app.get("/recommend/pages/{cursor}")
+def recommend_next_page(cursor: str, page_size: int = 10):
+    try:
+        items, next_cursor, total = pagination.next_page(cursor, _page_size(page_size))
+    except pagination.CursorExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    return _page_response(items, next_cursor, total)
+
+
+@app.post("/recommend/batch")
+def recommend_batch(payload: BatchRecommendationRequest, request: Request):
+    """Stream one NDJSON line per request, in order, as soon as each is scored.
+
+    Each line is `{"index": i, "recommended_assessments": [...]}` or, when that request
+    fails, `{"index": i, "error": {"status": ..., "detail": ...}}`; the stream continues.
+    """
+    lane = _lane(request)
+
+    def lines():
+        for i, req in enumerate(payload.requests):
+            try:
+                body = _results_json(_run_recommendation(req, lane=lane))
+                yield '{"index":%d,%s\n' % (i, body[1:])
+            except Exception as e:
+                yield json.dumps({"index": i, "error": _stream_error(e)}, separators=(",", ":")) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _stream_error(e: Exception) -> dict:
+    """Error payload for a failure after a streamed response has started (no status line left to set)."""
+    if isinstance(e, HTTPException):
+        return {"status": e.status_code, "detail": e.detail}
+    metrics.ERRORS.inc(stage="unhandled")
+    return {"status": 500, "detail": "Internal Server Error"}
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@app.post("/recommend/stream")
+def recommend_stream(payload: RecommendationRequest, request: Request):
+    """Server-sent events: a BM25-only `lexical` ranking first, then the `refined` ranking.
+
+    The lexical event only needs the inverted index, so clients can render it while
+    the full scoring runs. A failure after the first event is sent as an `error` event.
+    """
+    # fetch/validate before streaming so input errors still return a plain 400
+    job_text = _resolve_job_text(payload)
+    lane = _lane(request)
+
+    def events():
+        yield _sse("lexical", _results_json(recommend_lexical(job_text, top_k=_clamp_top_k(payload), **_filters(payload))))
+        try:
+            yield _sse("refined", _results_json(_run_recommendation(payload, job_text, lane)))
+        except Exception as e:
+            yield _sse("error", json.dumps(_stream_error(e), separators=(",", ":")))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/similar/{assessment_id}", response_model=RecommendationResponse)
+def similar_assessments(
+    assessment_id: str,
+    top_k: int = 10,
+    exclude_prepackaged: bool = False,
+    max_duration: Optional[int] = None,
+    remote_support: Optional[bool] = None,
+    adaptive_support: Optional[bool] = None,
+    test_types: Optional[List[str]] = Query(None),
+):
+    """Assessments similar to `assessment_id`, from the precomputed neighbour graph."""
+    top_k = min(max(top_k, 1), 50)
+    results = recommender.similar(assessment_id, top_k=top_k, exclude_prepackaged=exclude_prepackaged,
+                                  max_duration=max_duration, remote_support=remote_support,
+                                  adaptive_support=adaptive_support, test_types=test_types)
+    if results is None:
+        raise HTTPException(status_code=404, detail=f"Unknown assessment_id: {assessment_id}")
+    return Response(_results_json(results), media_type="application/json")
+
+
+@app.get("/catalog/export")
+def export_catalog():
+    """Stream the loaded catalog as NDJSON (one assessment per line)."""
+    items = recommender.raw_data  # a reload swaps the list, so this stays one snapshot
+
+    def lines():
+        for item in items:
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
-    return {"recommended_assessments": results}
 
 # 👇 Optional for local testing
 if __name__ == "__main__":
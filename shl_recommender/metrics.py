@@ -0,0 +1,190 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Kept dependency-free (no prometheus_client) so it works in the lightweight deploy.
+Pipeline code records stage latencies with `timed("stage")`; `/metrics` in main.py
+serves `render()`.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import profiling
+
+# seconds; tuned for stages that range from tens of microseconds to a slow URL fetch
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRY = []
+
+
+def _fmt_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    inner = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                     for k, v in pairs)
+    return '{' + inner + '}'
+
+
+def _fmt_value(v):
+    if v == float('inf'):
+        return '+Inf'
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[n] for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        """Evaluate `function()` at scrape time instead of storing a value (unlabelled gauges)."""
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            return [f"{self.name} {_fmt_value(self._function())}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels):
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        out = []
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, ('le', _fmt_value(bound)))} {cumulative}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(series[-2])}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {series[-1]}")
+        return out
+
+
+def _resident_memory_bytes():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        pass
+    try:
+        import resource
+        # ru_maxrss is KiB on Linux (peak, not current, but better than nothing)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+STAGE_SECONDS = Histogram('shl_stage_duration_seconds', 'Time spent in each recommendation pipeline stage.', ['stage'])
+REQUESTS = Counter('shl_http_requests_total', 'HTTP requests by endpoint and status code.', ['endpoint', 'status'])
+ERRORS = Counter('shl_errors_total', 'Failed requests by pipeline stage.', ['stage'])
+CACHE_HITS = Counter('shl_cache_hits_total', 'Cache hits by cache name.', ['cache'])
+CACHE_MISSES = Counter('shl_cache_misses_total', 'Cache misses by cache name.', ['cache'])
+COALESCED = Counter('shl_coalesced_requests_total', 'Calls that joined an identical in-flight computation.', ['stage'])
+SHED_REQUESTS = Counter('shl_shed_requests_total', 'Requests rejected because the service was overloaded.', ['lane'])
+LANE_QUEUE_SECONDS = Histogram('shl_lane_queue_seconds', 'Time a request waited for a scoring slot, by priority lane.', ['lane'])
+LANE_QUEUE_DEPTH = Gauge('shl_lane_queue_depth', 'Requests waiting for a scoring slot, by priority lane.', ['lane'])
+SNAPSHOT_VERSION = Gauge('shl_catalog_snapshot_version', 'Version of the loaded catalog snapshot.')
+RESIDENT_MEMORY = Gauge('shl_process_resident_memory_bytes', 'Resident memory of the serving process.',
+                        function=_resident_memory_bytes)
+
+
+@contextmanager
+def timed(stage):
+    """Record the wall time of the enclosed block under `stage` (and as a span if traced)."""
+    span = profiling.start_span(stage)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, stage=stage)
+        profiling.end_span(span)
+
+
+def render():
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.header())
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
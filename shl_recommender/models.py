@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional, Any
+from typing import Dict, List, Optional, Any
 
 
 class RecommendationRequest(BaseModel):
@@ -9,11 +9,27 @@ class RecommendationRequest(BaseModel):
     # Optional flags to control recommendation behavior
     balanced: Optional[bool] = False
     exclude_prepackaged: Optional[bool] = False
+    # Optional structured filters, applied before scoring
+    max_duration: Optional[int] = None  # minutes; items with unknown duration are excluded
+    remote_support: Optional[bool] = None  # items with unknown flags are kept
+    adaptive_support: Optional[bool] = None
+    test_types: Optional[List[str]] = None  # e.g. ["K", "P"] or ["Knowledge & Skills"]
     # Optional tuning parameters (dev use)
     w_skill: Optional[float] = None
     w_embed: Optional[float] = None
     w_diff: Optional[float] = None
     prefer_ratio: Optional[float] = None
+    candidate_n: Optional[int] = None  # first-stage candidate count (0 disables the cascade)
+
+
+class PagedRecommendationRequest(RecommendationRequest):
+    # first page of a cursor-paginated ranking; `top_k` and `balanced` are ignored
+    page_size: Optional[int] = 10
+
+
+class BatchRecommendationRequest(BaseModel):
+    # one result line per request, streamed as NDJSON in request order
+    requests: List[RecommendationRequest]
 
 
 class Assessment(BaseModel):
@@ -31,3 +47,5 @@ class Assessment(BaseModel):
 
 class RecommendationResponse(BaseModel):
     recommended_assessments: List[Assessment]
+    # per-stage timings, only present when requested with the X-Debug-Timing header
+    debug: Optional[Dict[str, Any]] = None
@@ -0,0 +1,61 @@
+"""Cursor pagination over cached full rankings.
+
+The first page request ranks the whole (filtered) catalog once with
+`recommender.rank_all()` and keeps the result compactly (int32 catalog indices plus
+float16 scores, ~6 bytes per item) under a random list id. Cursors are
+`<list id>.<offset>`; later pages slice the cached arrays until the entry expires
+(`SHL_CURSOR_TTL_S`), is evicted (`SHL_CURSOR_CACHE_SIZE` lists, LRU) or the catalog
+snapshot changes.
+"""
+import os
+import time
+import uuid
+
+import recommender
+from cache import LRUCache
+
+CURSOR_TTL_S = float(os.environ.get('SHL_CURSOR_TTL_S', '300'))
+MAX_PAGE_SIZE = 100
+
+_lists = LRUCache('ranked_list', int(os.environ.get('SHL_CURSOR_CACHE_SIZE', '256')))
+
+
+class CursorExpired(Exception):
+    pass
+
+
+class _RankedList:
+    __slots__ = ('indices', 'scores', 'snapshot', 'expires')
+
+    def __init__(self, indices, scores):
+        self.indices = indices
+        self.scores = scores
+        self.snapshot = recommender.SNAPSHOT_VERSION
+        self.expires = time.monotonic() + CURSOR_TTL_S
+
+
+def _page(list_id, ranked, offset, page_size):
+    end = min(offset + page_size, len(ranked.indices))
+    items = recommender._materialize(ranked.indices, ranked.scores, range(offset, end))
+    next_cursor = f'{list_id}.{end}' if end < len(ranked.indices) else None
+    return items, next_cursor, len(ranked.indices)
+
+
+def first_page(job_desc, page_size, **rank_kwargs):
+    """Rank, cache and return (items, next cursor or None, total ranked)."""
+    indices, scores = recommender.rank_all(job_desc, **rank_kwargs)
+    ranked = _RankedList(indices, scores)
+    list_id = uuid.uuid4().hex
+    _lists.put(list_id, ranked)
+    return _page(list_id, ranked, 0, page_size)
+
+
+def next_page(cursor, page_size):
+    """The page at `cursor`; raises CursorExpired for unknown, expired or stale cursors."""
+    list_id, _, offset = (cursor or '').partition('.')
+    if not offset.isdigit():
+        raise CursorExpired('malformed cursor')
+    ranked = _lists.get(list_id)
+    if ranked is None or ranked.expires < time.monotonic() or ranked.snapshot != recommender.SNAPSHOT_VERSION:
+        raise CursorExpired('cursor expired; request the first page again')
+    return _page(list_id, ranked, int(offset), page_size)
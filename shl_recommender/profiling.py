@@ -0,0 +1,229 @@
+"""On-demand request profiling and sampled trace capture.
+
+A request is traced when it sends `X-Debug-Timing: 1` (the per-stage breakdown is
+returned in the response `debug` field) and profiled when it is picked by the
+`SHL_PROFILE_SAMPLE_RATE` sampler or, with `SHL_PROFILE_ON_REQUEST=1`, sends
+`X-Profile: 1`. Profiled requests dump a cProfile file plus their structured span
+timings to `SHL_PROFILE_DIR`, which keeps only the newest `SHL_PROFILE_KEEP` captures.
+Only one request is profiled at a time (cProfile is process-wide, and Python 3.12+
+refuses a second active profiler); others arriving meanwhile are just traced, if at all.
+
+Spans are opened by `metrics.timed()` (every pipeline stage) and `span()`; they nest
+according to the call stack, so the dumps aggregate into flame graphs.
+
+Aggregate captures (from the `shl_recommender` folder):
+  python profiling.py aggregate                       # folded stacks of span self-time
+  python profiling.py aggregate --format pstats --out merged.prof
+  python profiling.py aggregate --format top          # hottest functions over all captures
+"""
+import argparse
+import contextvars
+import cProfile
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import warnings
+from contextlib import contextmanager
+from pathlib import Path
+
+PROFILE_DIR = Path(os.environ.get('SHL_PROFILE_DIR', 'profiles'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('SHL_PROFILE_SAMPLE_RATE', '0') or 0)
+PROFILE_KEEP = int(os.environ.get('SHL_PROFILE_KEEP', '200'))
+PROFILE_ON_REQUEST = os.environ.get('SHL_PROFILE_ON_REQUEST', '0') == '1'  # honour X-Profile
+
+_profiler_lock = threading.Lock()
+
+_current = contextvars.ContextVar('shl_trace', default=None)
+
+
+class Trace:
+    """Span timings of a single request."""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:12]
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.attrs = {}
+        self._stack = [name]
+
+    def breakdown(self):
+        """Total milliseconds per stage name (nested spans are counted in their own stage)."""
+        out = {}
+        for s in self.spans:
+            out[s['name']] = round(out.get(s['name'], 0.0) + s['duration_ms'], 3)
+        return out
+
+    def to_dict(self):
+        return {'id': self.id, 'total_ms': round((time.perf_counter() - self.t0) * 1e3, 3),
+                'spans': self.spans, 'stages_ms': self.breakdown(), 'attrs': self.attrs}
+
+
+def annotate(key, value):
+    """Attach a value (e.g. candidate counts) to the active trace, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs[key] = value
+
+
+def start_span(name):
+    trace = _current.get()
+    if trace is None:
+        return None
+    trace._stack.append(name)
+    return trace, ';'.join(trace._stack), time.perf_counter()
+
+
+def end_span(token):
+    if token is None:
+        return
+    trace, path, t0 = token
+    now = time.perf_counter()
+    trace._stack.pop()
+    trace.spans.append({
+        'name': path.rsplit(';', 1)[-1],
+        'path': path,
+        'start_ms': round((t0 - trace.t0) * 1e3, 3),
+        'duration_ms': round((now - t0) * 1e3, 3),
+    })
+
+
+@contextmanager
+def span(name):
+    """Record a span in the active trace (no-op when the request isn't traced)."""
+    token = start_span(name)
+    try:
+        yield
+    finally:
+        end_span(token)
+
+
+def should_profile(force=False):
+    """Whether to profile a request; `force` (the X-Profile header) counts only with SHL_PROFILE_ON_REQUEST."""
+    return (force and PROFILE_ON_REQUEST) or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+
+def _start_profiler():
+    """An enabled cProfile.Profile, or None while another one is running."""
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:  # another profiling tool is active (Python 3.12+)
+        _profiler_lock.release()
+        return None
+    return prof
+
+
+@contextmanager
+def request_trace(name, enabled, profile=False, meta=None):
+    """Trace (and optionally cProfile) the enclosed request handling.
+
+    Yields the active `Trace`, or None when neither tracing nor profiling is on (a
+    profile request is dropped while another request is being profiled).
+    """
+    prof = _start_profiler() if profile else None
+    if not (enabled or prof is not None):
+        yield None
+        return
+    trace = Trace(name)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        if prof is not None:
+            prof.disable()
+            _profiler_lock.release()
+        _current.reset(token)
+        trace.spans.append({'name': name, 'path': name, 'start_ms': 0.0,
+                            'duration_ms': round((time.perf_counter() - trace.t0) * 1e3, 3)})
+        if prof is not None:
+            try:
+                _dump(trace, prof, meta or {})
+            except Exception as e:
+                import metrics  # metrics imports this module for its spans
+                metrics.ERRORS.inc(stage="profile_dump")
+                warnings.warn(f"Failed to write profile capture {trace.id} to {PROFILE_DIR}: {e}")
+
+
+def _dump(trace, prof, meta):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{trace.id}"
+    prof.dump_stats(str(PROFILE_DIR / f"{stem}.prof"))
+    record = trace.to_dict()
+    record.update(meta)
+    (PROFILE_DIR / f"{stem}.json").write_text(json.dumps(record), encoding='utf-8')
+    _rotate(PROFILE_DIR, PROFILE_KEEP)
+
+
+def _rotate(directory, keep):
+    captures = sorted(Path(directory).glob('*.json'))
+    for old in captures[:max(len(captures) - keep, 0)]:
+        old.unlink(missing_ok=True)
+        old.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def folded_stacks(directory):
+    """Aggregate span self-time (microseconds) per stack path, flamegraph.pl 'folded' format."""
+    totals = {}
+    for path in sorted(Path(directory).glob('*.json')):
+        spans = json.loads(path.read_text(encoding='utf-8')).get('spans', [])
+        child_time = {}
+        for s in spans:
+            parent = s['path'].rsplit(';', 1)[0] if ';' in s['path'] else None
+            if parent:
+                child_time[parent] = child_time.get(parent, 0.0) + s['duration_ms']
+        # spans sharing a path (repeated stages) are summed, children subtracted once in total
+        by_path = {}
+        for s in spans:
+            by_path[s['path']] = by_path.get(s['path'], 0.0) + s['duration_ms']
+        for p, dur in by_path.items():
+            self_us = int(round((dur - child_time.get(p, 0.0)) * 1e3))
+            if self_us > 0:
+                totals[p] = totals.get(p, 0) + self_us
+    return [f"{p} {v}" for p, v in sorted(totals.items())]
+
+
+def merged_stats(directory):
+    import pstats
+    files = [str(p) for p in sorted(Path(directory).glob('*.prof'))]
+    if not files:
+        return None
+    return pstats.Stats(*files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate captured request profiles.')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    agg = sub.add_parser('aggregate')
+    agg.add_argument('directory', nargs='?', default=str(PROFILE_DIR))
+    agg.add_argument('--format', choices=('folded', 'pstats', 'top'), default='folded')
+    agg.add_argument('--out', help='output file (default: stdout; required for pstats)')
+    agg.add_argument('--limit', type=int, default=30, help='rows for --format top')
+    args = parser.parse_args()
+
+    if args.format == 'folded':
+        text = '\n'.join(folded_stacks(args.directory)) + '\n'
+        if args.out:
+            Path(args.out).write_text(text, encoding='utf-8')
+        else:
+            print(text, end='')
+        return
+
+    stats = merged_stats(args.directory)
+    if stats is None:
+        raise SystemExit(f'No .prof captures in {args.directory}')
+    if args.format == 'pstats':
+        if not args.out:
+            raise SystemExit('--out is required for --format pstats')
+        stats.dump_stats(args.out)
+        print('Wrote merged profile to', args.out)
+    else:
+        stats.sort_stats('cumulative').print_stats(args.limit)
+
+
+if __name__ == '__main__':
+    main()
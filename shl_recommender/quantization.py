@@ -0,0 +1,76 @@
+"""Int8 scalar-quantized embedding tier for the dense scan, with exact rescoring.
+
+Each dimension j of the L2-normalised embeddings is mapped to int8 codes with its own
+scale and offset, x[j] ~= offset[j] + scale[j] * code[j], so a query dot product becomes
+q.offset + (q * scale).codes. The scan reads 1 byte per dimension instead of 4; codes
+are widened to float32 one cache-sized block at a time (numpy has no int8 GEMM). The
+best `k * oversample` approximate hits are then rescored against the exact float32
+vectors, so returned similarities are always exact and only recall can suffer. Only
+those rows of the float32 matrix are read per query, so it can live in a memory map.
+`recall_at_k()` measures that against an exact scan.
+"""
+import numpy as np
+
+_BLOCK_ROWS = 4096
+
+
+def _top(scores, k):
+    # positions of the k highest scores, best first; ties keep the lower position
+    if k < len(scores):
+        kth = scores[np.argpartition(-scores, k - 1)[:k]].min()
+        cand = np.flatnonzero(scores >= kth)
+    else:
+        cand = np.arange(len(scores))
+    return cand[np.lexsort((cand, -scores[cand]))][:k]
+
+
+class QuantizedEmbeddings:
+    def __init__(self, exact):
+        """Quantize `exact` (n x d float32, normalised rows); rescoring reads `exact`."""
+        self.exact = exact
+        lo, hi = exact.min(axis=0), exact.max(axis=0)
+        self.offset = ((hi + lo) / 2).astype(np.float32)
+        self.scale = np.maximum((hi - lo) / 254, 1e-12).astype(np.float32)
+        self.codes = np.clip(np.rint((exact - self.offset) / self.scale), -127, 127).astype(np.int8)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scale.nbytes + self.offset.nbytes
+
+    def approx_scores(self, Q, rows=None):
+        """Approximate max-over-`Q` cosine for `rows` (default all), as float32."""
+        W = np.ascontiguousarray((Q * self.scale).T, dtype=np.float32)  # d x c
+        bias = Q @ self.offset
+        n = len(self.codes) if rows is None else len(rows)
+        out = np.empty(n, dtype=np.float32)
+        for lo in range(0, n, _BLOCK_ROWS):
+            hi = min(lo + _BLOCK_ROWS, n)
+            block = self.codes[lo:hi] if rows is None else self.codes[rows[lo:hi]]
+            s = block.astype(np.float32) @ W
+            out[lo:hi] = (s[:, 0] + bias[0]) if len(Q) == 1 else (s + bias).max(axis=1)
+        return out
+
+    def search(self, Q, k, rows=None, oversample=4):
+        """Top-`k` (catalog ids, exact similarities) among `rows`, best first.
+
+        `rows` must be sorted ascending (catalog order) so ties resolve to the lower id.
+        """
+        rows = np.arange(len(self.codes)) if rows is None else rows
+        approx = self.approx_scores(Q, None if len(rows) == len(self.codes) else rows)
+        shortlist = np.sort(rows[_top(approx, min(len(rows), k * oversample))])
+        sims = self.exact[shortlist] @ Q.T
+        sims = sims[:, 0] if len(Q) == 1 else sims.max(axis=1)
+        top = _top(sims, k)
+        return shortlist[top], sims[top]
+
+
+def recall_at_k(quantized, queries, k, oversample=4):
+    """Mean overlap between quantized+rescored and exact top-`k` for each query row."""
+    k = min(k, len(quantized.exact))
+    hits = 0
+    for q in queries:
+        Q = q[None, :].astype(np.float32)
+        exact = _top(quantized.exact @ Q[0], k)
+        ids, _ = quantized.search(Q, k, oversample=oversample)
+        hits += len(np.intersect1d(exact, ids))
+    return hits / (k * len(queries)) if len(queries) else 1.0
@@ -1,14 +1,37 @@
+import atexit
 import json
+import multiprocessing
 import re
 import os
+import tempfile
 import numpy as np
 import warnings
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity as sk_cos_sim
 
-# Load data (full catalog)
-with open(os.path.join("data", "shl_assessments.json"), "r", encoding="utf-8") as f:
-    raw_data = json.load(f).get("recommended_assessments", [])
+import embedding_batcher
+import jd_preprocess
+import metrics
+from cache import LRUCache, text_key
+import profiling
+from lexical import BM25Index
+import quantization
+import sharding
+from skill_matcher import ALIASES, build_skill_matcher, canonical
+
+# Catalog-derived state. Everything below is (re)built by `load_catalog()` so the
+# recommender can be pointed at a different catalog (e.g. synthetic scale tests).
+CATALOG_PATH = os.path.join("data", "shl_assessments.json")
+EMB_PATH = os.path.join("data", "doc_embeddings.npy")
+INDEX_MAP_PATH = os.path.join("data", "index_map.json")
+NEIGHBOURS_PATH = os.path.join("data", "neighbours.npz")
+QUERY_PROJECTION_PATH = os.path.join("data", "query_projection.npz")
+SNAPSHOT_VERSION = 0
+raw_data = []
+documents = []
+doc_embeddings = None
+doc_embeddings_np = None
+_USE_TF = False
 
 
 # Helper to detect pre-packaged solutions
@@ -24,37 +47,21 @@ def is_prepackaged(item: dict) -> bool:
     return False
 
 
-# Build document strings for the full catalog (keeps ordering aligned with raw_data)
-documents = [
-    (
+def _build_document(item: dict) -> str:
+    return (
         f"passage: {item.get('description','')} Skills assessed: {', '.join(item.get('skills', []))}. "
         f"Remote support: {item.get('remote_support')}. Adaptive: {item.get('adaptive_support')}. "
         f"Test types: {', '.join(item.get('test_type', []))}. Duration: {item.get('duration', '')} minutes."
     )
-    for item in raw_data
-]
 
 
-# Load precomputed document embeddings (recommended for lightweight deploys)
-EMB_PATH = os.path.join("data", "doc_embeddings.npy")
-doc_embeddings = None
-doc_embeddings_np = None
-if os.path.exists(EMB_PATH):
-    try:
-        doc_embeddings_np = np.load(EMB_PATH)
-        doc_embeddings = doc_embeddings_np
-        print(f"Loaded {doc_embeddings_np.shape} doc embeddings from {EMB_PATH}")
-    except Exception as e:
-        warnings.warn(f"Failed to load embeddings from {EMB_PATH}: {e}.")
-
-# If embeddings missing, we will lazily fall back to loading the SentenceTransformer model
-_USE_TF = True
-if doc_embeddings is None:
-    _USE_TF = False
+def _lexical_document(item: dict) -> str:
+    # item content only: the boilerplate of _build_document would match every item
+    return f"{item.get('description', '')} {' '.join(item.get('skills') or [])}"
 
 
 # small utility helpers for skill matching and difficulty
-_ALIASES = {"js": "javascript", "nodejs": "javascript", "csharp": "c#"}
+_ALIASES = ALIASES
 
 
 def _normalize_skill(s: str):
@@ -87,15 +94,24 @@ def _skill_overlap_norm(jd_text: str, item_skills) -> float:
     return matches / max(len(normalized), 1)
 
 
-def _difficulty_score(jd_text: str, item: dict) -> float:
+_JD_ENTRY_RE = re.compile(r"\b(entry|junior|graduate|new graduate)\b")
+_JD_SENIOR_RE = re.compile(r"\b(senior|lead|manager|director)\b")
+_ITEM_ENTRY_RE = re.compile(r"\b(entry|junior|graduate)\b")
+_ITEM_SENIOR_RE = _JD_SENIOR_RE
+
+
+def _jd_wants_level(jd_text: str):
     jd = (jd_text or "").lower()
-    wants_entry = bool(re.search(r"\b(entry|junior|graduate|new graduate)\b", jd))
-    wants_senior = bool(re.search(r"\b(senior|lead|manager|director)\b", jd))
+    return bool(_JD_ENTRY_RE.search(jd)), bool(_JD_SENIOR_RE.search(jd))
+
+
+def _difficulty_score(jd_text: str, item: dict) -> float:
+    wants_entry, wants_senior = _jd_wants_level(jd_text)
     if not (wants_entry or wants_senior):
         return 0.0
     desc = (item.get("description") or "").lower()
-    is_entry = bool(re.search(r"\b(entry|junior|graduate)\b", desc))
-    is_senior = bool(re.search(r"\b(senior|lead|manager|director)\b", desc))
+    is_entry = bool(_ITEM_ENTRY_RE.search(desc))
+    is_senior = bool(_ITEM_SENIOR_RE.search(desc))
     if wants_entry and is_entry:
         return 1.0
     if wants_senior and is_senior:
@@ -112,138 +128,931 @@ def _as_numpy(x):
     return np.asarray(x)
 
 
-# Build lightweight TF-IDF index over documents to approximate query embeddings
-_tfidf_vectorizer = TfidfVectorizer(max_features=16384, stop_words="english")
-_tfidf_doc_matrix = _tfidf_vectorizer.fit_transform(documents)
+# Lightweight TF-IDF index over documents
+_tfidf_vectorizer = None
+_tfidf_doc_matrix = None
+# BM25 inverted index over item names/skills, used to approximate query embeddings
+_bm25_index = None
+
+# Precomputed per-item columns shared by recommend() and recommend_balanced()
+_emb_normed = None          # L2-normalised doc embeddings (float32)
+_all_indices = None         # np.arange(n)
+_unpackaged_indices = None  # indices of items that are not pre-packaged solutions
+_unpackaged_mask = None     # same, as a boolean column
+_duration = None            # minutes as float, NaN when unknown
+_remote = None              # remote testing supported: int8 1 / 0, -1 when unknown
+_adaptive = None            # adaptive/IRT supported: int8 1 / 0, -1 when unknown
+_test_type_bits = None      # uint64 bitmask of test types, bit positions in _test_type_codes
+_test_type_codes = {}       # normalised test type -> bit position
+_has_k = None               # test types include K (knowledge & skills), bit of _test_type_bits
+_has_p = None               # test types include P (personality & behaviour), bit of _test_type_bits
+_is_entry = None            # description targets entry/junior/graduate level
+_is_senior = None           # description targets senior/lead/manager/director level
+_skill_vocab = []           # distinct normalised item skills
+_skill_single = {}          # skill without spaces -> vocab column
+_skill_part_index = {}      # token -> vocab columns of multi-word skills containing it
+_skill_part_counts = None   # distinct parts per multi-word skill column (0 for single-word)
+_skill_always = None        # columns of degenerate skills (whitespace only) that always match
+_skill_matcher = None       # Aho-Corasick matcher over single-word skills (+ common skills/aliases)
+_item_skill_matrix = None   # CSR (n_items x vocab), counts of each normalised skill per item
+_item_skill_counts = None   # number of normalised skills per item (denominator of overlap)
+_id_to_index = {}           # assessment_id -> catalog row
+_neighbour_ids = None       # (n, M) int32 top-M embedding neighbours per item (data/neighbours.npz)
+_neighbour_scores = None    # (n, M) float16 cosine similarities, aligned with _neighbour_ids
+_query_projection = None    # (W, bias, analyzer, idf) ridge map from TF-IDF to embedding space (data/query_projection.npz)
+_shard_pool = None          # sharding.ShardPool over _emb_normed, when SHL_SHARDS > 1
+_quantized = None           # quantization.QuantizedEmbeddings over _emb_normed, when SHL_QUANTIZE=1
+quantization_recall = None  # recall of the quantized tier vs exact search at the last (re)load
+
+# Per-query caches, cleared whenever a new catalog snapshot is loaded. The query cache
+# holds per-JD intermediates (query embeddings, matched skills), the result cache whole
+# recommend()/recommend_balanced() results. Sizes of 0 disable them.
+_query_cache = LRUCache("query", int(os.environ.get("SHL_QUERY_CACHE_SIZE", "2048")))
+_result_cache = LRUCache("result", int(os.environ.get("SHL_RESULT_CACHE_SIZE", "4096")))
+
+
+# SHL catalog test type names and their single-letter codes
+_TEST_TYPE_NAMES = {
+    "ability & aptitude": "A",
+    "biodata & situational judgement": "B",
+    "competencies": "C",
+    "development & 360": "D",
+    "assessment exercises": "E",
+    "knowledge & skills": "K",
+    "personality & behavior": "P",
+    "personality & behaviour": "P",
+    "simulations": "S",
+}
+
+
+def _normalize_test_type(t) -> str:
+    s = re.sub(r"\s+", " ", str(t or "")).strip()
+    if len(s) == 1:
+        return s.upper()
+    return _TEST_TYPE_NAMES.get(s.lower(), s.lower())
+
+
+def _parse_flag(v) -> bool:
+    if isinstance(v, str):
+        return v.strip().lower() in ("yes", "y", "true", "1")
+    return bool(v)
+
+
+def _parse_duration(v) -> float:
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return float(v)
+    m = re.search(r"\d+(?:\.\d+)?", str(v or ""))
+    return float(m.group(0)) if m else np.nan
+
+
+# The scraped catalog often leaves the structured fields empty; its full_description
+# text still carries "Test Type:ABP" and "Approximate Completion Time in minutes = 30".
+_DESC_TEST_TYPE_RE = re.compile(r"Test Type:\s*([A-Z]+)")
+_DESC_DURATION_RE = re.compile(r"Completion Time in minutes\s*=\s*([^\n]*)")
+_DESC_ADAPTIVE_RE = re.compile(r"(?<!not )\badaptive\b", re.IGNORECASE)
+
+
+def _item_test_types(item: dict):
+    types = item.get("test_type") or []
+    if not types:
+        m = _DESC_TEST_TYPE_RE.search(item.get("full_description") or "")
+        types = list(m.group(1)) if m else []
+    return types
+
+
+def _item_duration(item: dict) -> float:
+    if item.get("duration") not in (None, ""):
+        return _parse_duration(item.get("duration"))
+    m = _DESC_DURATION_RE.search(item.get("full_description") or "")
+    # ranges and caps ("15 to 35", "max 60") count as their upper bound
+    values = [float(v) for v in re.findall(r"\d+(?:\.\d+)?", m.group(1))] if m else []
+    return max(values) if values else np.nan
+
+
+def _item_flag(item: dict, field: str, desc_re=None) -> int:
+    """1 / 0 from the structured field, else from `desc_re` on full_description; -1 if unknown."""
+    if item.get(field) is not None:
+        return int(_parse_flag(item.get(field)))
+    if desc_re is not None and item.get("full_description"):
+        return int(bool(desc_re.search(item["full_description"])))
+    return -1
+
+
+def _build_filter_columns():
+    """Numeric / bitmask columns used to pre-filter the catalog before scoring."""
+    global _unpackaged_mask, _unpackaged_indices, _duration, _remote, _adaptive
+    global _test_type_bits, _test_type_codes
+
+    n = len(raw_data)
+    _unpackaged_mask = np.array([not is_prepackaged(item) for item in raw_data], dtype=bool)
+    _unpackaged_indices = np.flatnonzero(_unpackaged_mask)
+    _duration = np.array([_item_duration(item) for item in raw_data], dtype=np.float64)
+    # the remote-testing marker is an icon on the product page, so the scraped text has none
+    _remote = np.array([_item_flag(item, "remote_support") for item in raw_data], dtype=np.int8)
+    _adaptive = np.array([_item_flag(item, "adaptive_support", _DESC_ADAPTIVE_RE) for item in raw_data],
+                         dtype=np.int8)
+
+    _test_type_codes = {}
+    _test_type_bits = np.zeros(n, dtype=np.uint64)
+    for i, item in enumerate(raw_data):
+        bits = 0
+        for t in _item_test_types(item):
+            code = _normalize_test_type(t)
+            if code not in _test_type_codes:
+                if len(_test_type_codes) >= 64:
+                    warnings.warn(f"More than 64 distinct test types; '{t}' is not filterable")
+                    continue
+                _test_type_codes[code] = len(_test_type_codes)
+            bits |= 1 << _test_type_codes[code]
+        _test_type_bits[i] = bits
+
+
+def _test_type_mask(code: str):
+    """Boolean column: items with test type `code` in `_test_type_bits`."""
+    bit = _test_type_codes.get(code)
+    if bit is None:
+        return np.zeros(len(raw_data), dtype=bool)
+    return (_test_type_bits & np.uint64(1 << bit)) != 0
+
+
+def _build_scoring_columns():
+    """Precompute the vectorized scoring inputs from `raw_data` / `doc_embeddings`."""
+    global _emb_normed, _all_indices, _has_k, _has_p, _is_entry, _is_senior
+    global _skill_vocab, _skill_single, _skill_part_index, _skill_part_counts, _skill_always, _skill_matcher
+    global _item_skill_matrix, _item_skill_counts
+
+    n = len(raw_data)
+    _all_indices = np.arange(n)
+    _build_filter_columns()
+
+    if doc_embeddings is not None:
+        emb = np.asarray(doc_embeddings, dtype=np.float32)
+        _emb_normed = emb / (np.linalg.norm(emb, axis=1, keepdims=True) + 1e-12)
+    else:
+        _emb_normed = None
+
+    # same test types as the filters (structured field, else the description's "Test Type:")
+    _has_k = _test_type_mask("K")
+    _has_p = _test_type_mask("P")
+    _is_entry = np.zeros(n, dtype=bool)
+    _is_senior = np.zeros(n, dtype=bool)
+    vocab = {}
+    rows, cols = [], []
+    counts = np.zeros(n, dtype=np.float64)
+    for i, item in enumerate(raw_data):
+        desc = (item.get("description") or "").lower()
+        _is_entry[i] = bool(_ITEM_ENTRY_RE.search(desc))
+        _is_senior[i] = bool(_ITEM_SENIOR_RE.search(desc))
+        normalized = [_normalize_skill(sk) for sk in (item.get("skills") or [])]
+        normalized = [sk for sk in normalized if sk]
+        counts[i] = len(normalized)
+        for sk in normalized:
+            rows.append(i)
+            cols.append(vocab.setdefault(sk, len(vocab)))
+
+    _skill_vocab = list(vocab)
+    _skill_single = {sk: j for sk, j in vocab.items() if " " not in sk}
+    _skill_part_index = {}
+    _skill_part_counts = np.zeros(len(vocab), dtype=np.int64)
+    for sk, j in vocab.items():
+        if " " in sk:
+            parts = set(sk.split())
+            _skill_part_counts[j] = len(parts)
+            for part in parts:
+                _skill_part_index.setdefault(part, []).append(j)
+    _skill_always = np.array([j for sk, j in vocab.items() if " " in sk and not sk.split()], dtype=np.int64)
+    _skill_matcher = build_skill_matcher(_skill_single)
+    _item_skill_matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (rows, cols)), shape=(n, len(vocab))
+    )
+    _item_skill_counts = counts
+
+
+def _assessment_id(item: dict) -> str:
+    return item.get("assessment_id") or (item.get("url") or "").rstrip("/").split("/")[-1]
+
+
+def load_catalog(items, embeddings=None, neighbours=None, projection=None):
+    """(Re)build all catalog-derived state from `items` and optional doc `embeddings`.
+
+    `embeddings` rows must be aligned with `items`; so must the optional `neighbours`
+    graph, an (ids, scores) pair as written by data/build_vector_store.py. `projection`
+    is the query projection as written by data/fit_query_projection.py; it is only used
+    if it was fitted on this catalog's TF-IDF vocabulary.
+    Returns the new snapshot version.
+    """
+    global raw_data, documents, doc_embeddings, doc_embeddings_np, _USE_TF
+    global _tfidf_vectorizer, _tfidf_doc_matrix, _bm25_index, SNAPSHOT_VERSION
+    global _id_to_index, _neighbour_ids, _neighbour_scores, _query_projection
+
+    if embeddings is not None and len(embeddings) != len(items):
+        raise ValueError(f"embeddings rows ({len(embeddings)}) do not match catalog size ({len(items)})")
+    if neighbours is not None and len(neighbours[0]) != len(items):
+        raise ValueError(f"neighbour graph rows ({len(neighbours[0])}) do not match catalog size ({len(items)})")
+
+    raw_data = list(items)
+    # Build document strings for the full catalog (keeps ordering aligned with raw_data)
+    documents = [_build_document(item) for item in raw_data]
+
+    doc_embeddings_np = embeddings
+    doc_embeddings = embeddings
+    # If embeddings missing, we will lazily fall back to loading the SentenceTransformer model
+    _USE_TF = doc_embeddings is not None
+
+    _tfidf_vectorizer = TfidfVectorizer(max_features=16384, stop_words="english")
+    _tfidf_doc_matrix = _tfidf_vectorizer.fit_transform(documents)
+    _bm25_index = BM25Index([_lexical_document(item) for item in raw_data])
+    _build_scoring_columns()
+    _id_to_index = {}
+    for i, item in enumerate(raw_data):
+        _id_to_index.setdefault(_assessment_id(item), i)
+    _neighbour_ids, _neighbour_scores = neighbours if neighbours is not None else (None, None)
+    _query_projection = _check_query_projection(projection)
+    set_shards(SHARDS)
+    set_quantized(QUANTIZE)
+    _query_cache.clear()
+    _result_cache.clear()
+
+    SNAPSHOT_VERSION += 1
+    metrics.SNAPSHOT_VERSION.set(SNAPSHOT_VERSION)
+    return SNAPSHOT_VERSION
+
+
+# Two-stage cascade: when more than CANDIDATE_N items pass the filters, a cheap first
+# stage (BM25 + dense retrieval, rank-fused) picks CANDIDATE_N candidates and only those
+# get the skill/difficulty features and final weighted score.
+CANDIDATE_N = int(os.environ.get("SHL_CANDIDATE_N", "1000"))
+_RRF_K = 60  # reciprocal rank fusion constant
+
+
+# Scatter-gather dense retrieval: with SHL_SHARDS > 1 and at least SHL_SHARD_MIN_ITEMS
+# items, the cascade's dense stage runs on that many worker processes (sharding.py).
+SHARDS = int(os.environ.get("SHL_SHARDS", "0"))
+SHARD_MIN_ITEMS = int(os.environ.get("SHL_SHARD_MIN_ITEMS", "20000"))
+
+
+def set_shards(n_shards: int):
+    """(Re)start the shard pool for the current catalog with `n_shards` workers (<= 1 disables)."""
+    global SHARDS, _shard_pool
+    SHARDS = n_shards
+    if _shard_pool is not None:
+        _shard_pool.close()
+        _shard_pool = None
+    # never from a worker process (e.g. a bulk_score worker); one pool per serving process
+    if (n_shards > 1 and _emb_normed is not None and len(_emb_normed) >= SHARD_MIN_ITEMS
+            and multiprocessing.parent_process() is None):
+        _shard_pool = sharding.ShardPool(_emb_normed, n_shards)
+
+
+atexit.register(lambda: _shard_pool is not None and _shard_pool.close())
+
+# Int8 tier for the cascade's dense stage (quantization.py): SHL_QUANT_OVERSAMPLE x CANDIDATE_N
+# approximate hits are rescored exactly. On load the tier is checked against exact search
+# on SHL_QUANT_CHECK_QUERIES sampled items and dropped if recall is below SHL_QUANT_MIN_RECALL.
+QUANTIZE = os.environ.get("SHL_QUANTIZE", "0") == "1"
+QUANT_OVERSAMPLE = int(os.environ.get("SHL_QUANT_OVERSAMPLE", "4"))
+QUANT_MIN_RECALL = float(os.environ.get("SHL_QUANT_MIN_RECALL", "0.95"))
+QUANT_CHECK_QUERIES = int(os.environ.get("SHL_QUANT_CHECK_QUERIES", "16"))
+QUANT_CHECK_PATH = os.path.join("data", "train.json")  # recall is checked on these queries
+QUANT_SPILL_DIR = os.environ.get("SHL_QUANT_SPILL_DIR", "") or tempfile.gettempdir()
+
+
+def _quant_check_queries():
+    """Query embeddings for the recall check: labelled train queries, else sampled catalog rows."""
+    texts = []
+    if os.path.exists(QUANT_CHECK_PATH):
+        with open(QUANT_CHECK_PATH, "r", encoding="utf-8") as f:
+            texts = [t for t in dict.fromkeys(r.get("query") for r in json.load(f)) if t]
+    rows = [Q[0] for Q in (_query_matrix(t) for t in texts[:QUANT_CHECK_QUERIES]) if Q is not None]
+    if rows:
+        return np.asarray(rows, dtype=np.float32)
+    sample = np.random.default_rng(0).choice(len(_emb_normed), min(QUANT_CHECK_QUERIES, len(_emb_normed)),
+                                             replace=False)
+    return _emb_normed[sample]
+
+
+def _spill(matrix):
+    """`matrix` as a read-only memory map of a temporary file, so it can be paged out."""
+    fd, path = tempfile.mkstemp(prefix="shl_emb_", suffix=".npy", dir=QUANT_SPILL_DIR)
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, matrix)
+    mapped = np.load(path, mmap_mode="r")
+    try:
+        os.remove(path)  # the mapping keeps the data; frees the disk space once unmapped
+    except OSError:  # Windows: can't delete a mapped file
+        atexit.register(lambda: os.path.exists(path) and os.remove(path))
+    return mapped
+
+
+def set_quantized(enabled: bool):
+    """Build (or drop) the int8 tier for the current catalog; returns the measured recall.
+
+    With the tier in use the float32 `_emb_normed` moves to a memory-mapped temporary
+    file (SHL_QUANT_SPILL_DIR): the scan reads the int8 codes, and only rescored rows
+    are paged in.
+    """
+    global QUANTIZE, _quantized, quantization_recall, _emb_normed
+    QUANTIZE = enabled
+    _quantized = quantization_recall = None
+    if not enabled or _emb_normed is None or len(_emb_normed) <= CANDIDATE_N:
+        return None
+    tier = quantization.QuantizedEmbeddings(_emb_normed)
+    quantization_recall = quantization.recall_at_k(tier, _quant_check_queries(), CANDIDATE_N, QUANT_OVERSAMPLE)
+    if quantization_recall < QUANT_MIN_RECALL:
+        warnings.warn(f"Quantized embeddings recall@{CANDIDATE_N} {quantization_recall:.3f} < {QUANT_MIN_RECALL}; "
+                      "using exact dense search.")
+    else:
+        if not isinstance(_emb_normed, np.memmap):
+            _emb_normed = _spill(_emb_normed)
+        tier.exact = _emb_normed
+        _quantized = tier
+    return quantization_recall
+
+
+def load_default_catalog():
+    """Load the catalog JSON and precomputed embeddings (recommended for lightweight deploys)."""
+    with open(CATALOG_PATH, "r", encoding="utf-8") as f:
+        items = json.load(f).get("recommended_assessments", [])
+    embeddings = None
+    if os.path.exists(EMB_PATH):
+        try:
+            # with the int8 tier the raw vectors stay on disk too (see set_quantized)
+            embeddings = np.load(EMB_PATH, mmap_mode="r" if QUANTIZE else None)
+            print(f"Loaded {embeddings.shape} doc embeddings from {EMB_PATH}")
+        except Exception as e:
+            warnings.warn(f"Failed to load embeddings from {EMB_PATH}: {e}.")
+    return load_catalog(items, embeddings, _load_neighbour_graph(items), _load_query_projection())
+
+
+def _load_neighbour_graph(items):
+    """The persisted neighbour graph, if present and built for this catalog order."""
+    if not (os.path.exists(NEIGHBOURS_PATH) and os.path.exists(INDEX_MAP_PATH)):
+        return None
+    try:
+        with open(INDEX_MAP_PATH, "r", encoding="utf-8") as f:
+            index_map = json.load(f)
+        if index_map != [_assessment_id(item) for item in items]:
+            warnings.warn(f"{INDEX_MAP_PATH} does not match the catalog; rebuild with data/build_vector_store.py")
+            return None
+        with np.load(NEIGHBOURS_PATH) as graph:
+            return graph["ids"], graph["scores"]
+    except Exception as e:
+        warnings.warn(f"Failed to load neighbour graph from {NEIGHBOURS_PATH}: {e}.")
+        return None
+
+
+def _load_query_projection():
+    if not os.path.exists(QUERY_PROJECTION_PATH):
+        return None
+    try:
+        with np.load(QUERY_PROJECTION_PATH) as f:
+            return {k: f[k] for k in ("terms", "idf", "W", "bias")}
+    except Exception as e:
+        warnings.warn(f"Failed to load query projection from {QUERY_PROJECTION_PATH}: {e}.")
+        return None
+
+
+def _check_query_projection(projection):
+    """(W, bias, analyzer, idf) if `projection` fits the current vectorizer and embeddings, else None."""
+    if projection is None or doc_embeddings is None:
+        return None
+    W = np.asarray(projection["W"], dtype=np.float32)
+    terms, idf = projection["terms"], projection["idf"]
+    if (len(terms) != len(_tfidf_vectorizer.idf_)
+            or not np.array_equal(terms, _tfidf_vectorizer.get_feature_names_out())
+            or not np.allclose(idf, _tfidf_vectorizer.idf_)
+            or W.shape != (len(terms), doc_embeddings.shape[1])):
+        warnings.warn(f"{QUERY_PROJECTION_PATH} was fitted on a different catalog; "
+                      "refit with data/fit_query_projection.py")
+        return None
+    return (W, np.asarray(projection["bias"], dtype=np.float32), _tfidf_vectorizer.build_analyzer(),
+            _tfidf_vectorizer.idf_.astype(np.float32))
+
+
 
 def _compute_query_embedding_via_tfidf(job_desc: str, top_k_docs: int = 5):
-    """Approximate a query embedding by averaging the embeddings of the top TF-IDF matching documents."""
+    """Approximate a query embedding from its TF-IDF vector.
+
+    With a fitted query projection this is the projected TF-IDF vector (one sparse x
+    dense product). Otherwise, or when the query has no term in the TF-IDF vocabulary,
+    it is the average embedding of the `top_k_docs` best BM25 documents. Returns None
+    when no document shares a term with the query.
+    """
     if doc_embeddings is None:
         return None
-    q_vec = _tfidf_vectorizer.transform([job_desc])
-    sims = sk_cos_sim(q_vec, _tfidf_doc_matrix)[0]
-    top_idx = np.argsort(sims)[-top_k_docs:][::-1]
-    emb_subset = doc_embeddings[top_idx]
-    return np.mean(emb_subset, axis=0)
+    return _query_cache.get_or_compute(("embedding", text_key(job_desc), top_k_docs),
+                                       lambda: _query_embedding(job_desc, top_k_docs))
 
 
-def _get_kept_indices(exclude_prepackaged: bool):
-    if not exclude_prepackaged:
-        return list(range(len(raw_data)))
-    return [i for i, item in enumerate(raw_data) if not is_prepackaged(item)]
+def _query_embedding(job_desc: str, top_k_docs: int):
+    with metrics.timed("query_embedding"):
+        if _query_projection is not None:
+            q_emb = _projected_query_embedding(job_desc)
+            if q_emb is not None:
+                return q_emb
+        with metrics.timed("lexical_retrieval"):
+            top = _bm25_index.top_k(job_desc, top_k_docs)
+        if not top:
+            return None
+        emb_subset = doc_embeddings[[i for i, _ in top]]
+        return np.mean(emb_subset, axis=0)
 
 
-def recommend(job_desc: str, top_k=10, w_skill=0.6, w_embed=0.4, w_diff=0.0, exclude_prepackaged: bool = False):
-    """Recommend assessments for a job description.
+def _projection_features(job_desc: str):
+    """(vocabulary columns, weights) of the query's TF-IDF vector, or None without any term.
 
-    Supports excluding pre-packaged solutions by passing `exclude_prepackaged=True`.
-    Returns a list of candidate dicts augmented with a `score` field.
+    Same features as `_tfidf_vectorizer.transform()` (raw counts x idf, L2-normalised),
+    built directly from the analyzer so only the matched rows of W are touched.
     """
-    indices = _get_kept_indices(exclude_prepackaged)
-    if not indices:
-        return []
+    _, _, analyze, idf = _query_projection
+    vocab = _tfidf_vectorizer.vocabulary_
+    counts = {}
+    for tok in analyze(job_desc):
+        col = vocab.get(tok)
+        if col is not None:
+            counts[col] = counts.get(col, 0) + 1
+    if not counts:
+        return None
+    cols = np.fromiter(counts, dtype=np.int64, count=len(counts))
+    weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts)) * idf[cols]
+    weights /= np.linalg.norm(weights)
+    return cols, weights
+
+
+def _projected_query_embedding(job_desc: str):
+    """The query's TF-IDF vector times the projection; None without any vocabulary term."""
+    if _embedder is not None:
+        try:
+            return _embedder.submit(job_desc)
+        except (OSError, RuntimeError, ValueError) as e:  # sidecar down, failing or garbled: encode inline
+            metrics.ERRORS.inc(stage="embedding_batcher")
+            warnings.warn(f"Embedding batcher unavailable, encoding inline: {e}")
+    with metrics.timed("tfidf_transform"):
+        features = _projection_features(job_desc)
+    if features is None:
+        return None
+    W, bias = _query_projection[:2]
+    cols, weights = features
+    return weights @ W[cols] + bias
+
+
+def project_queries(texts):
+    """Projected embeddings of many queries as one sparse x dense product (None per text without a term).
 
+    This is the batch function behind SHL_EMBED_BATCHING (embedding_batcher.py).
+    """
+    out = [None] * len(texts)
+    if _query_projection is None:
+        return out
+    W, bias = _query_projection[:2]
+    features = [_projection_features(t) for t in texts]
+    rows = [i for i, f in enumerate(features) if f is not None]
+    if rows:
+        indptr = np.cumsum([0] + [len(features[i][0]) for i in rows])
+        X = sparse.csr_matrix((np.concatenate([features[i][1] for i in rows]),
+                               np.concatenate([features[i][0] for i in rows]), indptr),
+                              shape=(len(rows), W.shape[0]))
+        Y = X @ W + bias
+        for j, i in enumerate(rows):
+            out[i] = Y[j]
+    return out
+
+
+# Batched query encoding (embedding_batcher.py); None encodes inline.
+_embedder = embedding_batcher.make_encoder(embedding_batcher.EMBED_BATCHING, project_queries)
+
+
+def _get_kept_indices(exclude_prepackaged: bool, max_duration=None, remote_support=None,
+                      adaptive_support=None, test_types=None):
+    """Catalog indices passing the structured filters, as one vectorized mask.
+
+    `max_duration` drops items longer than the limit or with unknown duration;
+    `remote_support` / `adaptive_support` keep items whose flag equals the value or is
+    unknown (the catalog has no remote-testing data, for instance);
+    `test_types` keeps items having any of the given types (names or letter codes).
+    """
+    if max_duration is None and remote_support is None and adaptive_support is None and not test_types:
+        return _unpackaged_indices if exclude_prepackaged else _all_indices
+
+    mask = _unpackaged_mask.copy() if exclude_prepackaged else np.ones(len(raw_data), dtype=bool)
+    if max_duration is not None:
+        # NaN (unknown duration) compares False, so unknown durations are excluded
+        mask &= _duration <= float(max_duration)
+    if remote_support is not None:
+        mask &= (_remote == int(bool(remote_support))) | (_remote < 0)
+    if adaptive_support is not None:
+        mask &= (_adaptive == int(bool(adaptive_support))) | (_adaptive < 0)
+    if test_types:
+        wanted = 0
+        for t in test_types:
+            bit = _test_type_codes.get(_normalize_test_type(t))
+            if bit is not None:
+                wanted |= 1 << bit
+        mask &= (_test_type_bits & np.uint64(wanted)) != 0
+    return np.flatnonzero(mask)
+
+
+def _matched_skills(jd_text: str):
+    """Boolean vector over `_skill_vocab`: which catalog skills the JD mentions.
+
+    Same rule as `_skill_overlap_norm` (plus skill aliases), found with one pass of the
+    compiled skill matcher instead of checking every skill against every token.
+    """
+    return _query_cache.get_or_compute(("skills", text_key(jd_text)), lambda: _match_skills(jd_text))
+
+
+def _match_skills(jd_text: str):
+    matched = np.zeros(len(_skill_vocab), dtype=np.float64)
+    jd_tokens = _extract_jd_tokens(jd_text)
+    if not jd_tokens:
+        return matched
+    # a skill without spaces is a substring of some token iff it occurs in the
+    # space-joined tokens (it cannot straddle a separator)
+    for surface in _skill_matcher.find(" ".join(jd_tokens)):
+        if surface in _ALIASES and surface not in jd_tokens:
+            continue  # aliases are short; only count them as whole tokens
+        j = _skill_single.get(canonical(surface))
+        if j is not None:
+            matched[j] = 1.0
+    # multi-word skills match when every part is a JD token
+    if _skill_part_index:
+        hits = {}
+        for tok in jd_tokens:
+            for j in _skill_part_index.get(tok, ()):
+                hits[j] = hits.get(j, 0) + 1
+        for j, n in hits.items():
+            if n == _skill_part_counts[j]:
+                matched[j] = 1.0
+    matched[_skill_always] = 1.0
+    return matched
+
+
+def _skill_scores(job_desc: str, indices):
+    """Vectorized `_skill_overlap_norm` for the items in `indices`."""
+    matched = _matched_skills(job_desc)
+    hits = _item_skill_matrix[indices] @ matched
+    counts = _item_skill_counts[indices]
+    return np.divide(hits, counts, out=np.zeros_like(hits), where=counts > 0)
+
+
+def _difficulty_scores(job_desc: str, indices):
+    """Vectorized `_difficulty_score` for the items in `indices`."""
+    wants_entry, wants_senior = _jd_wants_level(job_desc)
+    out = np.zeros(len(indices), dtype=np.float64)
+    if wants_entry:
+        out[_is_entry[indices]] = 1.0
+    if wants_senior:
+        out[_is_senior[indices]] = 1.0
+    return out
+
+
+def _query_matrix(job_desc: str, chunks=None):
+    """L2-normalised query embeddings, one row per chunk (None without any)."""
+    q_embs = [_compute_query_embedding_via_tfidf(c, top_k_docs=5) for c in (chunks or [job_desc])]
+    q_embs = [q for q in q_embs if q is not None]
+    if not q_embs:
+        return None
+    Q = np.asarray(q_embs, dtype=np.float32)
+    Q /= np.linalg.norm(Q, axis=1, keepdims=True) + 1e-12
+    return Q
+
+
+def _query_sims(Q, indices):
+    """Best-chunk cosine similarity of each item in `indices` to the rows of `Q`."""
+    if Q is None:
+        return np.zeros(len(indices), dtype=np.float64)
+    if len(Q) == 1:
+        return (_emb_normed[indices] @ Q[0]).astype(np.float64)
+    return (_emb_normed[indices] @ Q.T).max(axis=1).astype(np.float64)
+
+
+def _dense_scores(job_desc: str, indices, chunks=None):
+    """Cosine similarity between the query and each item in `indices`.
+
+    With several `chunks` (long JDs, see jd_preprocess) each chunk gets its own query
+    embedding and an item's similarity is its best chunk similarity.
+    """
     # If we have precomputed doc embeddings, compute query embedding via TF-IDF fallback
     if doc_embeddings is not None:
-        q_emb = _compute_query_embedding_via_tfidf(job_desc, top_k_docs=5)
-        if q_emb is None:
-            sim_scores = [0.0] * len(indices)
-        else:
-            emb_subset = doc_embeddings[indices]
-            q = q_emb / (np.linalg.norm(q_emb) + 1e-12)
-            E = emb_subset / (np.linalg.norm(emb_subset, axis=1, keepdims=True) + 1e-12)
-            sim_scores = (E @ q).tolist()
+        Q = _query_matrix(job_desc, chunks)
+        with metrics.timed("dense_scoring"):
+            return _query_sims(Q, indices)
+
+    # fallback: lazily load model and compute true embeddings (may be heavy)
+    try:
+        from sentence_transformers import SentenceTransformer, util
+
+        model = SentenceTransformer("intfloat/e5-small-v2")
+        query_embedding = model.encode(f"query: {job_desc}", convert_to_tensor=True)
+        emb_subset = model.encode([documents[i] for i in indices], convert_to_tensor=True)
+        return np.asarray(util.cos_sim(query_embedding, emb_subset)[0].cpu().tolist(), dtype=np.float64)
+    except Exception:
+        return np.zeros(len(indices), dtype=np.float64)
+
+
+def _candidates(job_desc: str, indices, dense_ids, candidate_n):
+    """Stage 1: positions (into `indices`) of the best `candidate_n` fused lexical+dense hits.
+
+    `dense_ids` are the catalog ids of the dense top-`candidate_n`, best first.
+    """
+    fused = np.zeros(len(indices), dtype=np.float64)
+    ranks = 1.0 / (_RRF_K + 1.0 + np.arange(candidate_n))
+
+    # lexical retrieval restricted to the filtered items
+    pos_of = np.full(len(raw_data), -1, dtype=np.int64)
+    pos_of[indices] = np.arange(len(indices))
+    allowed = pos_of >= 0
+    lex_ids, lex_scores = _bm25_index.scores(job_desc, allowed)
+    if len(lex_ids):
+        lex_top = lex_ids[_top_k(lex_scores.astype(np.float64), candidate_n)]
+        fused[pos_of[lex_top]] += ranks[:len(lex_top)]
+
+    fused[pos_of[dense_ids]] += ranks[:len(dense_ids)]
+
+    positions = _top_k(fused, candidate_n)
+    return positions[fused[positions] > 0] if fused.any() else positions
+
+
+def _prepare_jd(job_desc: str):
+    """Bound and chunk the JD (see jd_preprocess); scoring only ever sees the bounded text."""
+    with metrics.timed("jd_preprocessing"):
+        jd = jd_preprocess.prepare(job_desc)
+    profiling.annotate("jd_tokens", jd.n_tokens)
+    profiling.annotate("jd_truncated", jd.truncated)
+    profiling.annotate("jd_chunks", len(jd.chunks))
+    return jd
+
+
+def _score(job_desc: str, indices, w_skill, w_embed, w_diff, candidate_n=None):
+    """Combined scores; returns (scored indices, aligned scores).
+
+    All of `indices` are scored unless the cascade kicks in, in which case only the
+    stage-1 candidates are returned.
+    """
+    jd = _prepare_jd(job_desc)
+    job_desc = jd.text
+    candidate_n = CANDIDATE_N if candidate_n is None else candidate_n
+    cascade = 0 < candidate_n < len(indices)
+    profiling.annotate("catalog_items", int(len(indices)))
+    profiling.annotate("candidate_n", int(candidate_n) if cascade else None)
+    pool = _shard_pool
+    sharded = pool is not None and candidate_n <= sharding.MAX_K
+    if cascade and (sharded or _quantized is not None):
+        # dense top-candidate_n from the shards / int8 tier; exact sims only for the survivors
+        Q = _query_matrix(job_desc, jd.chunks)
+        with metrics.timed("candidate_generation"):
+            dense_ids = None
+            if Q is not None and sharded:
+                with metrics.timed("sharded_dense_retrieval"):
+                    dense_ids = _sharded_top_k(pool, Q, candidate_n, indices)
+            if Q is not None and dense_ids is None and _quantized is not None:
+                with metrics.timed("quantized_dense_retrieval"):
+                    dense_ids, _ = _quantized.search(Q, candidate_n, indices, QUANT_OVERSAMPLE)
+            if Q is not None and dense_ids is None:
+                # the shard pool just died: exact in-process scan
+                dense_ids = indices[_top_k(_query_sims(Q, indices), candidate_n)]
+            if dense_ids is None:
+                dense_ids = np.empty(0, dtype=np.int64)
+            indices = indices[_candidates(job_desc, indices, dense_ids, candidate_n)]
+        with metrics.timed("dense_scoring"):
+            sim = _query_sims(Q, indices)
     else:
-        # fallback: lazily load model and compute true embeddings (may be heavy)
-        try:
-            from sentence_transformers import SentenceTransformer, util
+        sim = _dense_scores(job_desc, indices, jd.chunks)
+        if cascade:
+            with metrics.timed("candidate_generation"):
+                # dense retrieval (skipped when there is no query embedding)
+                dense_ids = indices[_top_k(sim, candidate_n)] if sim.any() else np.empty(0, dtype=np.int64)
+                positions = _candidates(job_desc, indices, dense_ids, candidate_n)
+                indices, sim = indices[positions], sim[positions]
+    profiling.annotate("candidates_scored", int(len(indices)))
 
-            model = SentenceTransformer("intfloat/e5-small-v2")
-            query_embedding = model.encode(f"query: {job_desc}", convert_to_tensor=True)
-            emb_subset = model.encode([documents[i] for i in indices], convert_to_tensor=True)
-            sim_scores = util.cos_sim(query_embedding, emb_subset)[0].cpu().tolist()
-        except Exception:
-            sim_scores = [0.0] * len(indices)
+    if w_skill:
+        with metrics.timed("skill_scoring"):
+            skill = _skill_scores(job_desc, indices)
+    if w_diff:
+        with metrics.timed("difficulty_scoring"):
+            diff = _difficulty_scores(job_desc, indices)
+    with metrics.timed("score_combination"):
+        combined = w_embed * sim
+        if w_skill:
+            combined += w_skill * skill
+        if w_diff:
+            combined += w_diff * diff
+    return indices, combined
 
-    scored = []
-    for idx, score_sim in zip(indices, sim_scores):
-        item = raw_data[idx]
-        skills = item.get("skills") or []
-        s_overlap = _skill_overlap_norm(job_desc, skills)
-        diff = _difficulty_score(job_desc, item)
-        combined = (w_skill * s_overlap) + (w_embed * float(score_sim)) + (w_diff * diff)
-        out = dict(item)
-        out["score"] = combined
-        scored.append(out)
 
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    return scored[:top_k]
+def _sharded_top_k(pool, Q, k, indices):
+    """Catalog ids of the dense top-`k` among `indices` from `pool`; None if the pool is gone."""
+    global _shard_pool
+    mask = None
+    if len(indices) < len(raw_data):
+        mask = np.zeros(len(raw_data), dtype=bool)
+        mask[indices] = True
+    try:
+        return pool.top_k(Q, k, mask)[0]
+    except sharding.WorkerLost as e:
+        if _shard_pool is pool:  # not just replaced by a reload
+            _shard_pool = None
+            metrics.ERRORS.inc(stage="sharded_dense_retrieval")
+            warnings.warn(f"Dropping the shard pool, scanning in-process: {e}")
+        pool.close()
+        return None
 
 
-def recommend_balanced(job_desc: str, top_k=10, w_skill=0.6, w_embed=0.4, w_diff=0.0, prefer_ratio=0.5, exclude_prepackaged: bool = False):
+def _top_k(scores, k):
+    """Positions of the `k` highest scores, best first; ties keep catalog order."""
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        # O(n) partition, then widen to every position tied with the k-th score so the
+        # final order matches a stable full sort
+        kth = scores[np.argpartition(-scores, k - 1)[:k]].min()
+        cand = np.flatnonzero(scores >= kth)
+    else:
+        cand = np.arange(n)
+    order = np.lexsort((cand, -scores[cand]))
+    return cand[order[:k]]
+
+
+def _materialize(indices, scores, positions):
+    out = []
+    for pos in positions:
+        item = dict(raw_data[int(indices[pos])])
+        item["score"] = float(scores[pos])
+        out.append(item)
+    return out
+
+
+def recommend(job_desc: str, top_k=10, w_skill=0.6, w_embed=0.4, w_diff=0.0, exclude_prepackaged: bool = False,
+              max_duration=None, remote_support=None, adaptive_support=None, test_types=None, candidate_n=None):
+    """Recommend assessments for a job description.
+
+    Supports excluding pre-packaged solutions by passing `exclude_prepackaged=True`, and
+    the structured filters of `_get_kept_indices()`, applied before scoring.
+    `candidate_n` overrides the cascade size (`SHL_CANDIDATE_N`; 0 scores everything).
+    Returns a list of candidate dicts augmented with a `score` field; results are cached
+    per snapshot and shared between callers, so don't mutate them.
+    """
+    key = ("recommend", text_key(job_desc), top_k, w_skill, w_embed, w_diff, bool(exclude_prepackaged), max_duration,
+           remote_support, adaptive_support, tuple(test_types or ()), candidate_n)
+    return _result_cache.get_or_compute(key, lambda: _recommend(
+        job_desc, top_k, w_skill, w_embed, w_diff, exclude_prepackaged,
+        max_duration, remote_support, adaptive_support, test_types, candidate_n))
+
+
+def _recommend(job_desc, top_k, w_skill, w_embed, w_diff, exclude_prepackaged,
+               max_duration, remote_support, adaptive_support, test_types, candidate_n):
+    indices = _get_kept_indices(exclude_prepackaged, max_duration, remote_support, adaptive_support, test_types)
+    if not len(indices):
+        return []
+
+    indices, scores = _score(job_desc, indices, w_skill, w_embed, w_diff, candidate_n)
+    with metrics.timed("top_k_selection"):
+        positions = _top_k(scores, top_k)
+        return _materialize(indices, scores, positions)
+
+
+def recommend_lexical(job_desc: str, top_k=10, exclude_prepackaged: bool = False,
+                      max_duration=None, remote_support=None, adaptive_support=None, test_types=None):
+    """Fast BM25-only ranking (no embeddings or skill features), for progressive responses.
+
+    Takes the same filters as `recommend()`; `score` is the raw BM25 score. Items sharing
+    no term with the query are not returned.
+    """
+    indices = _get_kept_indices(exclude_prepackaged, max_duration, remote_support, adaptive_support, test_types)
+    if not len(indices):
+        return []
+    job_desc = _prepare_jd(job_desc).text
+    with metrics.timed("lexical_ranking"):
+        allowed = None
+        if len(indices) < len(raw_data):
+            allowed = np.zeros(len(raw_data), dtype=bool)
+            allowed[indices] = True
+        doc_ids, scores = _bm25_index.scores(job_desc, allowed)
+        scores = scores.astype(np.float64)
+        return _materialize(doc_ids, scores, _top_k(scores, top_k))
+
+
+def rank_all(job_desc: str, w_skill=0.6, w_embed=0.4, w_diff=0.0, exclude_prepackaged: bool = False,
+             max_duration=None, remote_support=None, adaptive_support=None, test_types=None, candidate_n=None):
+    """Full ranking for paging: (catalog indices as int32, scores as float16), best first.
+
+    Same order as `recommend()`; with the cascade on, only the
+    stage-1 candidates are ranked.
+    """
+    indices = _get_kept_indices(exclude_prepackaged, max_duration, remote_support, adaptive_support, test_types)
+    if not len(indices):
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float16)
+    indices, scores = _score(job_desc, indices, w_skill, w_embed, w_diff, candidate_n)
+    with metrics.timed("full_ranking"):
+        order = np.lexsort((np.arange(len(scores)), -scores))
+        return indices[order].astype(np.int32), scores[order].astype(np.float16)
+
+
+def recommend_balanced(job_desc: str, top_k=10, w_skill=0.6, w_embed=0.4, w_diff=0.0, prefer_ratio=0.5, exclude_prepackaged: bool = False,
+                       max_duration=None, remote_support=None, adaptive_support=None, test_types=None, candidate_n=None):
     """
     Greedy balanced recommender: attempts to include a mix of K (knowledge) and P (personality)
     test types in the top_k results. `prefer_ratio` is fraction of K items desired in top_k.
     If exact mix isn't available, falls back to best scoring items.
     """
-    indices = _get_kept_indices(exclude_prepackaged)
-    if not indices:
+    key = ("balanced", text_key(job_desc), top_k, w_skill, w_embed, w_diff, prefer_ratio, bool(exclude_prepackaged),
+           max_duration, remote_support, adaptive_support, tuple(test_types or ()), candidate_n)
+    return _result_cache.get_or_compute(key, lambda: _recommend_balanced(
+        job_desc, top_k, w_skill, w_embed, w_diff, prefer_ratio, exclude_prepackaged,
+        max_duration, remote_support, adaptive_support, test_types, candidate_n))
+
+
+def _recommend_balanced(job_desc, top_k, w_skill, w_embed, w_diff, prefer_ratio, exclude_prepackaged,
+                        max_duration, remote_support, adaptive_support, test_types, candidate_n):
+    indices = _get_kept_indices(exclude_prepackaged, max_duration, remote_support, adaptive_support, test_types)
+    if not len(indices):
+        return []
+
+    indices, scores = _score(job_desc, indices, w_skill, w_embed, w_diff, candidate_n)
+    with metrics.timed("balancing"):
+        positions = _balance(indices, scores, top_k, prefer_ratio)
+        return _materialize(indices, scores, positions)
+
+
+def similar(assessment_id: str, top_k=10, exclude_prepackaged: bool = False,
+            max_duration=None, remote_support=None, adaptive_support=None, test_types=None):
+    """Assessments most similar to `assessment_id` by embedding cosine; None if the id is unknown.
+
+    Served from the precomputed neighbour graph (an array lookup); the filters of
+    `_get_kept_indices()` apply. Falls back to an exact scan over the catalog when there
+    is no graph or too few graph neighbours pass the filters.
+    """
+    idx = _id_to_index.get(assessment_id)
+    if idx is None:
+        return None
+    with metrics.timed("similar_lookup"):
+        filtered = exclude_prepackaged or max_duration is not None or remote_support is not None \
+            or adaptive_support is not None or bool(test_types)
+        kept = _get_kept_indices(exclude_prepackaged, max_duration, remote_support, adaptive_support, test_types) \
+            if filtered else _all_indices
+        if _neighbour_ids is not None:
+            ids, scores = _neighbour_ids[idx], _neighbour_scores[idx]
+            if filtered:
+                allowed = np.zeros(len(raw_data), dtype=bool)
+                allowed[kept] = True
+                keep = allowed[ids]
+                ids, scores = ids[keep], scores[keep]
+            # the graph has every item's M best neighbours; enough of them passing the
+            # filters means they are also the best among the filtered items
+            if len(ids) >= top_k or len(ids) == len(kept) - int(idx in kept):
+                return _materialize(ids, scores.astype(np.float64), np.arange(min(top_k, len(ids))))
+
+    if _emb_normed is None:
         return []
+    with metrics.timed("similar_scan"):
+        kept = kept[kept != idx]
+        sims = (_emb_normed[kept] @ _emb_normed[idx]).astype(np.float64)
+        return _materialize(kept, sims, _top_k(sims, top_k))
+
 
-    emb_subset = doc_embeddings[indices]
-    emb_subset = _as_tensor(emb_subset)
-
-    query_embedding = model.encode(f"query: {job_desc}", convert_to_tensor=True)
-    sim_scores = util.cos_sim(query_embedding, emb_subset)[0].cpu().tolist()
-
-    scored = []
-    for idx, score_sim in zip(indices, sim_scores):
-        item = raw_data[idx]
-        skills = item.get("skills") or []
-        s_overlap = _skill_overlap_norm(job_desc, skills)
-        diff = _difficulty_score(job_desc, item)
-        combined = (w_skill * s_overlap) + (w_embed * float(score_sim)) + (w_diff * diff)
-        out = dict(item)
-        out["score"] = combined
-        scored.append(out)
-
-    # sort by score
-    scored.sort(key=lambda x: x["score"], reverse=True)
-
-    # partition candidates by K vs P vs other
-    k_list = []
-    p_list = []
-    other = []
-    for c in scored:
-        types = c.get("test_type") or []
-        found_k = any(("k" in str(t).lower()) for t in types)
-        found_p = any(("p" in str(t).lower()) for t in types)
-        if found_k and not found_p:
-            k_list.append(c)
-        elif found_p and not found_k:
-            p_list.append(c)
-        else:
-            other.append(c)
+def _balance(indices, scores, top_k, prefer_ratio):
+    """Pick positions mixing K-only, P-only and other items, best-first within each bucket."""
+    has_k = _has_k[indices]
+    has_p = _has_p[indices]
+    # partition candidates by K vs P vs other; only the best top_k of each bucket can be used
+    buckets = []
+    for mask in (has_k & ~has_p, has_p & ~has_k, ~(has_k ^ has_p)):
+        members = np.flatnonzero(mask)
+        buckets.append(members[_top_k(scores[members], top_k)])
+    k_list, p_list, other = buckets
 
     # desired counts
     desired_k = int(round(prefer_ratio * top_k))
     desired_p = top_k - desired_k
 
     selected = []
+    n_k = n_p = 0
     ki = pi = oi = 0
+
+    def take(pos):
+        nonlocal n_k, n_p
+        selected.append(pos)
+        n_k += int(has_k[pos])
+        n_p += int(has_p[pos])
+
     # greedy fill alternatingly to preserve score ordering within each bucket
     while len(selected) < top_k:
-        if len([s for s in selected if any(("k" in str(t).lower()) for t in (s.get("test_type") or []))]) < desired_k and ki < len(k_list):
-            selected.append(k_list[ki]); ki += 1; continue
-        if len([s for s in selected if any(("p" in str(t).lower()) for t in (s.get("test_type") or []))]) < desired_p and pi < len(p_list):
-            selected.append(p_list[pi]); pi += 1; continue
+        if n_k < desired_k and ki < len(k_list):
+            take(k_list[ki]); ki += 1; continue
+        if n_p < desired_p and pi < len(p_list):
+            take(p_list[pi]); pi += 1; continue
         if oi < len(other):
-            selected.append(other[oi]); oi += 1; continue
+            take(other[oi]); oi += 1; continue
         if ki < len(k_list):
-            selected.append(k_list[ki]); ki += 1; continue
+            take(k_list[ki]); ki += 1; continue
         if pi < len(p_list):
-            selected.append(p_list[pi]); pi += 1; continue
+            take(p_list[pi]); pi += 1; continue
         break
 
-    return selected[:top_k]
+    return selected
+
 
+# Last, so the int8 tier's recall check (set_quantized) can already encode queries.
+load_default_catalog()
@@ -0,0 +1,185 @@
+"""Scale-test mode: measure build time, memory and per-query latency across catalog sizes.
+
+For each size a synthetic catalog (see `synthetic_catalog.py`) is loaded into the
+recommender with `recommender.load_catalog()`. We record index build time and traced
+memory peak, resident size of the built structures, and p50/p95 latency of the full
+`recommend()` call plus its main stages, so it is visible which stage stops scaling
+first (TF-IDF query embedding, dense scan, skill scoring, top-k selection).
+
+Run (from the `shl_recommender` folder):
+  python scale_test.py                              # 1k, 10k, 50k
+  python scale_test.py --sizes 1000 50000 1000000 --queries 20 --budget-ms 50
+  python scale_test.py --out data/scale_report.json
+  python scale_test.py --sizes 200000 --shards 1 2 4      # dense stage on N worker processes
+  python scale_test.py --sizes 200000 --quantize           # int8 dense tier (+ its recall)
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+import recommender
+from benchmark import DEFAULT_QUERIES
+from synthetic_catalog import generate
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+
+# time the pipeline itself, not repeated-query cache hits
+recommender._query_cache.maxsize = recommender._result_cache.maxsize = 0
+
+
+def _percentiles(samples):
+    p50, p95 = np.percentile(np.asarray(samples) * 1e3, [50, 95])
+    return {'p50_ms': round(float(p50), 3), 'p95_ms': round(float(p95), 3)}
+
+
+def _state_bytes():
+    """Approximate bytes held by the catalog-derived structures."""
+    total = 0
+    if recommender.doc_embeddings is not None:
+        total += recommender.doc_embeddings.nbytes
+    m = recommender._tfidf_doc_matrix
+    if recommender._quantized is not None:
+        total += recommender._quantized.nbytes
+    if m is not None:
+        total += m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+    bm25 = recommender._bm25_index
+    if bm25 is not None:
+        total += sum(ids.nbytes + impact.nbytes for ids, impact in bm25.postings.values())
+    return total
+
+
+def _stages(job_desc):
+    """Time the main stages of `recommend()` individually; returns {stage: seconds}."""
+    out = {}
+    t0 = time.perf_counter()
+    q_emb = recommender._compute_query_embedding_via_tfidf(job_desc, top_k_docs=5)
+    out['query_embedding'] = time.perf_counter() - t0
+
+    indices = recommender._get_kept_indices(False)
+    t0 = time.perf_counter()
+    q = q_emb / (np.linalg.norm(q_emb) + 1e-12)
+    scores = recommender._emb_normed[indices] @ q.astype(np.float32)
+    out['dense_scan'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    recommender._skill_scores(job_desc, indices)
+    recommender._difficulty_scores(job_desc, indices)
+    out['skill_scoring'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    recommender._top_k(scores.astype(np.float64), 10)
+    out['top_k'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    recommender.recommend(job_desc, top_k=10)
+    out['recommend'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    recommender.recommend_balanced(job_desc, top_k=10)
+    out['recommend_balanced'] = time.perf_counter() - t0
+    return out
+
+
+def run_size(size, n_queries, seed=0, shards=0, quantize=False):
+    items, embeddings = generate(size, seed=seed)
+    gc.collect()
+    recommender.SHARDS, recommender.SHARD_MIN_ITEMS = shards, 0
+    recommender.QUANTIZE = quantize
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    recommender.load_catalog(items, embeddings)
+    build_s = time.perf_counter() - t0
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    queries = [DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)] for i in range(n_queries)]
+    _stages(queries[0])  # warm-up
+    samples = {}
+    for q in queries:
+        for stage, secs in _stages(q).items():
+            samples.setdefault(stage, []).append(secs)
+
+    return {
+        'size': size,
+        'shards': shards,
+        'quantized_recall': recommender.quantization_recall,
+        'build_s': round(build_s, 3),
+        'build_peak_mb': round(build_peak / 2**20, 1),
+        'state_mb': round(_state_bytes() / 2**20, 1),
+        'tfidf_vocab': len(recommender._tfidf_vectorizer.vocabulary_),
+        'stages': {stage: _percentiles(vals) for stage, vals in samples.items()},
+    }
+
+
+def find_breakpoints(rows, budget_ms):
+    """First size at which each stage's p50 exceeds the budget."""
+    out = {}
+    for row in rows:
+        for stage, stats in row['stages'].items():
+            if stage not in out and stats['p50_ms'] > budget_ms:
+                out[stage] = row['size']
+    return out
+
+
+def print_report(rows, breakpoints, budget_ms):
+    stages = list(rows[0]['stages']) if rows else []
+    header = f"{'size':>10}{'shards':>8}{'build s':>10}{'peak MB':>10}{'state MB':>10}" + ''.join(f"{s + ' p50':>24}" for s in stages)
+    print(header)
+    for row in rows:
+        if row['quantized_recall'] is not None:
+            print(f"{row['size']} items: int8 tier recall@{recommender.CANDIDATE_N} {row['quantized_recall']:.3f}")
+    for row in rows:
+        line = f"{row['size']:>10}{row['shards']:>8}{row['build_s']:>10.2f}{row['build_peak_mb']:>10.1f}{row['state_mb']:>10.1f}"
+        line += ''.join(f"{row['stages'][s]['p50_ms']:>21.2f} ms" for s in stages)
+        print(line)
+    # per-item cost between consecutive sizes shows which stage grows linearly
+    for prev, cur in zip(rows, rows[1:]):
+        if cur['size'] == prev['size']:
+            continue
+        growth = cur['size'] / prev['size']
+        parts = []
+        for s in stages:
+            a, b = prev['stages'][s]['p50_ms'], cur['stages'][s]['p50_ms']
+            parts.append(f"{s} x{(b / a if a else float('inf')):.1f}")
+        print(f"{prev['size']} -> {cur['size']} (x{growth:.0f} items): " + ', '.join(parts))
+    if breakpoints:
+        for stage, size in breakpoints.items():
+            print(f"{stage} exceeds {budget_ms} ms p50 at {size} items")
+    else:
+        print(f"All stages stay under {budget_ms} ms p50 at the tested sizes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scale test the recommender on synthetic catalogs.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--queries', type=int, default=10, help='queries timed per size')
+    parser.add_argument('--budget-ms', type=float, default=100.0, help='per-stage p50 latency budget')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shards', type=int, nargs='+', default=[0],
+                        help='shard worker counts to compare per size (0 = in-process)')
+    parser.add_argument('--quantize', action='store_true', help='use the int8 dense tier (see quantization.py)')
+    parser.add_argument('--out', help='write the report as JSON')
+    args = parser.parse_args()
+
+    rows = []
+    for size in sorted(args.sizes):
+        for shards in args.shards:
+            print(f"Building synthetic catalog of {size} items ({shards or 'no'} shards)...")
+            rows.append(run_size(size, args.queries, seed=args.seed, shards=shards, quantize=args.quantize))
+    recommender.set_shards(0)
+    breakpoints = find_breakpoints(rows, args.budget_ms)
+    print_report(rows, breakpoints, args.budget_ms)
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'budget_ms': args.budget_ms, 'sizes': rows, 'breakpoints': breakpoints}, f, indent=2)
+        print('Wrote', args.out)
+
+
+if __name__ == '__main__':
+    main()
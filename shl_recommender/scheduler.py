@@ -0,0 +1,140 @@
+"""Priority lanes in front of scoring: interactive traffic first, bulk with a guaranteed share.
+
+Scoring runs in at most `SHL_SCORING_CONCURRENCY` slots. A request takes a free slot
+immediately when nobody is queued; otherwise it waits in its lane's bounded FIFO queue
+(`SHL_LANE_QUEUE_INTERACTIVE` / `SHL_LANE_QUEUE_BULK`) and a full queue sheds it
+(`Overloaded`, counted in `metrics.SHED_REQUESTS`), as does waiting longer than
+`SHL_LANE_WAIT_TIMEOUT_S`. A finished request hands its slot to the next waiter:
+interactive first, except that while both lanes are waiting bulk gets at least
+`SHL_BULK_MIN_SHARE` of the hand-offs, so backfills keep moving. Running work is never
+interrupted; priority applies at dispatch.
+
+Endpoints are sync, so every queued request holds one of the server's
+`SHL_THREADPOOL_SIZE` worker threads while it waits. The default queue limits keep
+slots plus both queues below that pool, bulk at most a third of the room, so a bulk
+burst is shed instead of taking every thread and leaving interactive requests to
+wait for one in the server's lane-blind FIFO.
+
+The lane comes from the API key (`SHL_LANE_API_KEYS`, e.g. `key1:bulk,key2:interactive`)
+or else the `X-Priority: bulk|interactive` header; the default is interactive. Queue
+time and depth per lane are in `metrics.LANE_QUEUE_SECONDS` / `LANE_QUEUE_DEPTH`.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+SCORING_CONCURRENCY = int(os.environ.get("SHL_SCORING_CONCURRENCY", str(os.cpu_count() or 4)))
+THREADPOOL_SIZE = int(os.environ.get("SHL_THREADPOOL_SIZE", "40"))  # Starlette/anyio default
+THREAD_HEADROOM = 8  # threads left for URL fetches, /similar, /metrics, ...
+_room = max(2, THREADPOOL_SIZE - THREAD_HEADROOM - SCORING_CONCURRENCY)
+QUEUE_LIMITS = {
+    INTERACTIVE: int(os.environ.get("SHL_LANE_QUEUE_INTERACTIVE", str(_room - _room // 3))),
+    BULK: int(os.environ.get("SHL_LANE_QUEUE_BULK", str(_room // 3))),
+}
+BULK_MIN_SHARE = float(os.environ.get("SHL_BULK_MIN_SHARE", "0.2"))
+WAIT_TIMEOUT_S = float(os.environ.get("SHL_LANE_WAIT_TIMEOUT_S", "10"))
+
+
+def _parse_api_keys(spec):
+    lanes = {}
+    for entry in spec.split(","):
+        key, _, lane = entry.strip().rpartition(":")
+        if key and lane in LANES:
+            lanes[key] = lane
+    return lanes
+
+
+API_KEY_LANES = _parse_api_keys(os.environ.get("SHL_LANE_API_KEYS", ""))
+
+
+class Overloaded(Exception):
+    def __init__(self, lane, reason="queue is full"):
+        super().__init__(f"{lane} {reason}")
+        self.lane = lane
+
+
+def lane_for(api_key=None, priority=None):
+    """Lane for a request from its API key or, failing that, its X-Priority header."""
+    lane = API_KEY_LANES.get(api_key or "")
+    if lane is None:
+        lane = (priority or "").strip().lower()
+    return lane if lane in LANES else INTERACTIVE
+
+
+class LaneScheduler:
+    def __init__(self, slots=SCORING_CONCURRENCY, queue_limits=None, bulk_min_share=BULK_MIN_SHARE,
+                 wait_timeout=WAIT_TIMEOUT_S):
+        self.slots = max(1, slots)
+        self.queue_limits = dict(QUEUE_LIMITS if queue_limits is None else queue_limits)
+        self.bulk_min_share = bulk_min_share
+        self.wait_timeout = wait_timeout
+        self._free = self.slots
+        self._waiting = {lane: deque() for lane in LANES}
+        self._bulk_credit = 0.0
+        self._lock = threading.Lock()
+
+    def _next_lane(self):
+        interactive, bulk = self._waiting[INTERACTIVE], self._waiting[BULK]
+        if interactive and bulk:
+            # contended: bulk earns `bulk_min_share` of a slot per hand-off
+            self._bulk_credit += self.bulk_min_share
+            if self._bulk_credit >= 1.0:
+                self._bulk_credit -= 1.0
+                return BULK
+            return INTERACTIVE
+        if interactive:
+            return INTERACTIVE
+        return BULK if bulk else None
+
+    def acquire(self, lane):
+        t0 = time.perf_counter()
+        with self._lock:
+            if self._free and not (self._waiting[INTERACTIVE] or self._waiting[BULK]):
+                self._free -= 1
+                ticket = None
+            else:
+                queue = self._waiting[lane]
+                if len(queue) >= self.queue_limits[lane]:
+                    metrics.SHED_REQUESTS.inc(lane=lane)
+                    raise Overloaded(lane)
+                ticket = threading.Event()
+                queue.append(ticket)
+                metrics.LANE_QUEUE_DEPTH.set(len(queue), lane=lane)
+        if ticket is not None and not ticket.wait(self.wait_timeout):
+            with self._lock:
+                queue = self._waiting[lane]
+                # release() may have handed over the slot just after the timeout
+                timed_out = not ticket.is_set()
+                if timed_out:
+                    queue.remove(ticket)
+                    metrics.LANE_QUEUE_DEPTH.set(len(queue), lane=lane)
+            if timed_out:
+                metrics.SHED_REQUESTS.inc(lane=lane)
+                raise Overloaded(lane, f"queue wait exceeded {self.wait_timeout:g}s")
+        metrics.LANE_QUEUE_SECONDS.observe(time.perf_counter() - t0, lane=lane)
+
+    def release(self):
+        with self._lock:
+            lane = self._next_lane()
+            if lane is None:
+                self._free += 1
+                return
+            queue = self._waiting[lane]
+            ticket = queue.popleft()
+            metrics.LANE_QUEUE_DEPTH.set(len(queue), lane=lane)
+            ticket.set()  # under the lock, so a timed-out waiter sees either the slot or its queue entry
+
+    def run(self, lane, fn):
+        """Run `fn()` in a scoring slot of `lane`; raises Overloaded if the lane's queue is full."""
+        self.acquire(lane)
+        try:
+            return fn()
+        finally:
+            self.release()
@@ -1,8 +1,11 @@
 import json
 import os
-from difflib import SequenceMatcher
+import sys
 
 ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+from fuzzy_match import FuzzyMatcher  # noqa: E402
+
 DATA = os.path.join(ROOT, 'data')
 REPORT = os.path.join(DATA, 'remap_report.json')
 OUT = os.path.join(DATA, 'remap_report_auto.json')
@@ -21,6 +24,9 @@ for it in catalog:
 def norm(s):
     return (s or '').lower().replace('-', ' ').replace('_', ' ').strip()
 
+# one index over both the assessment id and the description of every item
+matcher = FuzzyMatcher((aid, norm(text)) for aid, name in items for text in (aid, name))
+
 auto = {'mapped': report.get('remapped', []), 'auto_suggested': []}
 
 for u in report.get('unresolved', []):
@@ -28,20 +34,8 @@ for u in report.get('unresolved', []):
     # use last path segment or description
     seg = orig.rstrip('/').split('/')[-1].lower()
     seg = seg.replace('%28','(').replace('%29',')')
-    best = None
-    best_score = 0.0
-    for aid, name in items:
-        # compare against assessment id and description
-        s1 = norm(seg)
-        s2 = norm(aid)
-        s3 = norm(name)
-        # use several similarity checks
-        r1 = SequenceMatcher(None, s1, s2).ratio()
-        r2 = SequenceMatcher(None, s1, s3).ratio()
-        r = max(r1, r2)
-        if r > best_score:
-            best_score = r
-            best = aid
+    # compare against assessment id and description
+    best, best_score = matcher.best(norm(seg))
     auto['auto_suggested'].append({'query': u.get('query'), 'original': u.get('original'), 'best_match': best, 'score': best_score})
 
 with open(OUT, 'w', encoding='utf-8') as f:
@@ -0,0 +1,326 @@
+"""Offline bulk scoring of job descriptions (JSONL or CSV in, sharded JSONL/CSV/Parquet out).
+
+The input is streamed; rows are grouped into micro-batches and scored by a pool of
+worker processes, each with its own loaded recommender. At most a few batches per
+worker are in flight, so memory stays flat for inputs of any size. Output is long
+format, one row per (input row, rank): `input_row, id, rank, assessment_id, url,
+score`, split into shards of `--shard-rows` input rows (part-00000.jsonl, ...).
+
+Each shard is written to a temporary file and renamed when complete, and
+`_checkpoint.json` in the output directory then records how many input rows are
+done and the byte offset where the next one starts. `--resume` seeks there and
+continues with the next shard, so an interrupted run neither loses nor duplicates
+output. Malformed input rows (bad JSON or CSV, CSV fields over `--max-field-bytes`) are
+reported on stderr and skipped; they keep their `input_row` number.
+
+Run (from the `shl_recommender` folder):
+  python -m scripts.bulk_score data/requisitions.jsonl --out-dir out/rescore --workers 8
+  python -m scripts.bulk_score archive.csv --query-field description --id-field req_id --format parquet
+  python -m scripts.bulk_score archive.csv --out-dir out/rescore --resume
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import get_context
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+QUERY_FIELDS = ('job_description', 'query', 'text', 'description')
+COLUMNS = ['input_row', 'id', 'rank', 'assessment_id', 'url', 'score']
+CHECKPOINT = '_checkpoint.json'
+_EXT = {'jsonl': '.jsonl', 'csv': '.csv', 'parquet': '.parquet'}
+MAX_FIELD_BYTES = 16 * 1024 * 1024
+
+_options = None
+
+
+def _lines(f, pos):
+    # readline (not iteration) so the file can be seeked; pos[0] is the byte offset read so far
+    while True:
+        line = f.readline()
+        if not line:
+            return
+        pos[0] += len(line)
+        yield line.decode('utf-8', errors='replace')
+
+
+def read_rows(path, offset=0, max_field_bytes=MAX_FIELD_BYTES):
+    """Yield (row dict or None if malformed, byte offset after the row) from .csv or JSONL.
+
+    `offset` is where to start reading, as returned for an earlier row (the CSV header
+    is always read from the top).
+    """
+    is_csv = path.lower().endswith('.csv')
+    with open(path, 'rb') as f:
+        pos = [0]
+        lines = _lines(f, pos)
+        if is_csv:
+            # the csv module's own limit aborts mid-record and loses sync; check sizes after parsing
+            csv.field_size_limit(2 ** 31 - 1)
+            reader = csv.reader(lines)
+            header = next(reader, None)
+            if header is None:
+                return
+        if offset:
+            f.seek(offset)
+            pos[0] = offset
+        if not is_csv:
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    print(f'Skipping malformed JSON line ending at byte {pos[0]}: {e}', file=sys.stderr)
+                    row = None
+                yield (row if isinstance(row, dict) else None), pos[0]
+            return
+        while True:
+            try:
+                values = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                print(f'Skipping malformed CSV row ending at byte {pos[0]}: {e}', file=sys.stderr)
+                yield None, pos[0]
+                continue
+            if any(len(v) > max_field_bytes for v in values):
+                print(f'Skipping CSV row ending at byte {pos[0]}: field over {max_field_bytes} bytes',
+                      file=sys.stderr)
+                yield None, pos[0]
+            elif values:
+                yield dict(zip(header, values)), pos[0]
+
+
+def _init_worker(options):
+    global _options
+    _options = options
+    import recommender  # noqa: F401  (loads the catalog once per worker)
+
+
+def _score_batch(batch):
+    from recommender import recommend, recommend_balanced
+
+    top_k, balanced, exclude = _options['top_k'], _options['balanced'], _options['exclude_prepackaged']
+    out = []
+    for input_row, row_id, query in batch:
+        if not query:
+            continue
+        if balanced:
+            results = recommend_balanced(query, top_k=top_k, exclude_prepackaged=exclude)
+        else:
+            results = recommend(query, top_k=top_k, exclude_prepackaged=exclude)
+        for rank, r in enumerate(results, start=1):
+            out.append({'input_row': input_row, 'id': row_id, 'rank': rank,
+                        'assessment_id': r.get('assessment_id'), 'url': r.get('url'), 'score': r.get('score')})
+    return len(batch), out
+
+
+class ShardWriter:
+    """Writes output shards via temp files; `finish_shard()` makes one visible."""
+
+    def __init__(self, out_dir, fmt, shard):
+        self.out_dir, self.fmt, self.shard = out_dir, fmt, shard
+        self._open()
+
+    def _path(self):
+        return os.path.join(self.out_dir, f'part-{self.shard:05d}{_EXT[self.fmt]}')
+
+    def _open(self):
+        self._rows = []
+        self._f = None
+        if self.fmt != 'parquet':
+            self._f = open(self._path() + '.tmp', 'w', encoding='utf-8', newline='')
+            if self.fmt == 'csv':
+                self._csv = csv.DictWriter(self._f, fieldnames=COLUMNS)
+                self._csv.writeheader()
+
+    def write(self, rows):
+        if self.fmt == 'jsonl':
+            self._f.writelines(json.dumps(r, ensure_ascii=False) + '\n' for r in rows)
+        elif self.fmt == 'csv':
+            self._csv.writerows(rows)
+        else:
+            self._rows.extend(rows)
+
+    def finish_shard(self):
+        tmp = self._path() + '.tmp'
+        if self.fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pylist(self._rows, schema=pa.schema([
+                ('input_row', pa.int64()), ('id', pa.string()), ('rank', pa.int32()),
+                ('assessment_id', pa.string()), ('url', pa.string()), ('score', pa.float64())]))
+            pq.write_table(table, tmp)
+        else:
+            self._f.close()
+        os.replace(tmp, self._path())
+        self.shard += 1
+        self._open()
+
+    def discard(self):
+        if self._f is not None:
+            self._f.close()
+        tmp = self._path() + '.tmp'
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _batches(rows, query_field, id_field, batch_size, first_row):
+    """Yield (batch, byte offset after its last row); rows are numbered from `first_row`."""
+    batch = []
+    offset = None
+    for input_row, (row, offset) in enumerate(rows, start=first_row):
+        row = row or {}
+        row_id = row.get(id_field) if id_field else input_row
+        batch.append((input_row, None if row_id is None else str(row_id), row.get(query_field) or ''))
+        if len(batch) == batch_size:
+            yield batch, offset
+            batch = []
+    if batch:
+        yield batch, offset
+
+
+def _detect_query_field(path):
+    for row, _ in read_rows(path):
+        if row is None:
+            continue
+        for field in QUERY_FIELDS:
+            if field in row:
+                return field
+        raise SystemExit(f'No query column found (tried {", ".join(QUERY_FIELDS)}); pass --query-field')
+    raise SystemExit(f'{path} is empty')
+
+
+def _load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_checkpoint(path, state):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def run(args):
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit('--format parquet requires pyarrow (pip install pyarrow)')
+    os.makedirs(args.out_dir, exist_ok=True)
+    query_field = args.query_field or _detect_query_field(args.input)
+    settings = {'input': os.path.abspath(args.input), 'query_field': query_field, 'id_field': args.id_field,
+                'format': args.format, 'shard_rows': args.shard_rows, 'top_k': args.top_k,
+                'balanced': args.balanced, 'exclude_prepackaged': args.exclude_prepackaged}
+    ckpt_path = os.path.join(args.out_dir, CHECKPOINT)
+    state = _load_checkpoint(ckpt_path)
+    if state is not None and not args.resume:
+        raise SystemExit(f'{args.out_dir} holds an earlier run; pass --resume or use a new --out-dir')
+    if state is not None and state['settings'] != settings:
+        raise SystemExit(f'--resume settings differ from the checkpoint: {state["settings"]}')
+    if state is None:
+        state = {'settings': settings, 'rows_done': 0, 'input_offset': 0, 'next_shard': 0, 'done': False}
+    if state['done']:
+        print(f'Already complete: {state["rows_done"]} rows in {state["next_shard"]} shards')
+        return state
+
+    # a shard always covers whole batches, so batches must divide the shard size
+    batch_size = max(1, min(args.batch_size, args.shard_rows))
+    while args.shard_rows % batch_size:
+        batch_size -= 1
+
+    writer = ShardWriter(args.out_dir, args.format, state['next_shard'])
+    options = {k: settings[k] for k in ('top_k', 'balanced', 'exclude_prepackaged')}
+    rows_in = read_rows(args.input, state.get('input_offset', 0), args.max_field_bytes)
+    if 'input_offset' not in state:  # checkpoint from before offsets were recorded: skip by count
+        for _ in range(state['rows_done']):
+            next(rows_in, None)
+    batches = _batches(rows_in, query_field, args.id_field, batch_size, state['rows_done'])
+    t0 = last_report = time.perf_counter()
+    rows = in_shard = 0
+    ctx = get_context(args.start_method) if args.start_method else get_context()
+    pool = ctx.Pool(args.workers, initializer=_init_worker, initargs=(options,))
+    try:
+        pending = deque()
+        exhausted = False
+        while pending or not exhausted:
+            # keep a bounded number of batches in flight, in input order
+            while not exhausted and len(pending) < args.workers * 2:
+                item = next(batches, None)
+                if item is None:
+                    exhausted = True
+                else:
+                    batch, offset = item
+                    pending.append((pool.apply_async(_score_batch, (batch,)), offset))
+            if not pending:
+                break
+            result, offset = pending.popleft()
+            n, out = result.get()
+            writer.write(out)
+            rows += n
+            in_shard += n
+            if in_shard == args.shard_rows:
+                writer.finish_shard()
+                state['rows_done'] += in_shard
+                state['input_offset'] = offset
+                state['next_shard'] = writer.shard
+                _save_checkpoint(ckpt_path, state)
+                in_shard = 0
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                print(f'{state["rows_done"] + in_shard} rows, {rows / (now - t0):.1f} rows/s', file=sys.stderr)
+                last_report = now
+        if in_shard:
+            writer.finish_shard()
+            state['rows_done'] += in_shard
+            state['input_offset'] = offset
+            state['next_shard'] = writer.shard
+        writer.discard()
+        state['done'] = True
+        _save_checkpoint(ckpt_path, state)
+    except BaseException:
+        writer.discard()
+        raise
+    finally:
+        pool.terminate()
+        pool.join()
+
+    elapsed = time.perf_counter() - t0
+    print(f'Scored {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.1f} rows/s); '
+          f'{state["rows_done"]} rows in {state["next_shard"]} shards under {args.out_dir}')
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-score job descriptions from JSONL/CSV.')
+    parser.add_argument('input', help='.jsonl (one JSON object per line) or .csv with a header row')
+    parser.add_argument('--out-dir', default=os.path.join('out', 'bulk'))
+    parser.add_argument('--format', choices=sorted(_EXT), default='jsonl')
+    parser.add_argument('--query-field', help=f'input column with the JD (default: first of {", ".join(QUERY_FIELDS)})')
+    parser.add_argument('--id-field', help='input column copied to the output `id` (default: input row number)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=64, help='rows per micro-batch sent to a worker')
+    parser.add_argument('--shard-rows', type=int, default=100000, help='input rows per output shard (checkpoint unit)')
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--balanced', action='store_true', help='use recommend_balanced()')
+    parser.add_argument('--exclude-prepackaged', action='store_true')
+    parser.add_argument('--resume', action='store_true', help='continue the run checkpointed in --out-dir')
+    parser.add_argument('--max-field-bytes', type=int, default=MAX_FIELD_BYTES,
+                        help='larger CSV fields make the row malformed (skipped)')
+    parser.add_argument('--report-every', type=float, default=10.0, help='seconds between progress lines')
+    parser.add_argument('--start-method', choices=['fork', 'spawn', 'forkserver'],
+                        help='multiprocessing start method (default: platform default)')
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Local stand-in for the LLM skill extraction backend.
+
+Answers POST /extract with {"skills": [...]} from the regex `fallback_extract()`, with
+optional artificial latency and failure rate, so the concurrent/cached extraction path
+in skill_extractor.py can be exercised without an API key.
+
+Run (from the `shl_recommender` folder):
+  python -m scripts.stub_llm_server --port 8765 --latency-ms 200 --fail-rate 0.1
+  SKILL_EXTRACT_BACKEND=http python skill_extractor.py --workers 16
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from skill_extractor import fallback_extract  # noqa: E402
+
+
+def make_handler(latency_ms, fail_rate):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._reply(400, {'error': 'invalid json'})
+                return
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            if random.random() < fail_rate:
+                self._reply(503, {'error': 'simulated failure'})
+                return
+            self._reply(200, {'skills': fallback_extract(body.get('text') or '')})
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub LLM server for skill extraction.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='added delay per request')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.latency_ms, args.fail_rate))
+    print(f'Stub LLM server on http://{args.host}:{args.port}/extract')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
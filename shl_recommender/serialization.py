@@ -0,0 +1,69 @@
+"""Fast JSON rendering of recommendation responses.
+
+Catalog fields never change between requests, so each item's public JSON (as the
+`Assessment` model renders it) is produced once per catalog snapshot and split around
+its `score` value. A response is then the k fragments spliced with their scores, with
+no per-request model validation or encoding of catalog fields. Output is byte-identical
+to `RecommendationResponse(...).model_dump_json(exclude={"debug"})`.
+"""
+import math
+import threading
+
+from pydantic_core import to_json
+
+import recommender
+from models import Assessment
+
+_SCORE_SLOT = '"score":null'
+
+_lock = threading.Lock()
+_snapshot = None
+_fragments = {}  # assessment_id -> (json up to and including '"score":', json after the score)
+
+
+def _build():
+    fragments = {}
+    seen = set()
+    for item in recommender.raw_data:
+        aid = item.get("assessment_id")
+        if aid in seen:
+            # ambiguous id: those items go through the model every time
+            fragments.pop(aid, None)
+            continue
+        seen.add(aid)
+        head, _, tail = Assessment(**{**item, "score": None}).model_dump_json().partition(_SCORE_SLOT)
+        fragments[aid] = (head + '"score":', tail)
+    return fragments
+
+
+def fragments():
+    """Fragments for the current catalog snapshot (built on first use after a reload)."""
+    global _snapshot, _fragments
+    version = recommender.SNAPSHOT_VERSION
+    if _snapshot != version:
+        with _lock:
+            if _snapshot != version:
+                _fragments = _build()
+                _snapshot = version
+    return _fragments
+
+
+def _score_json(score):
+    # same float formatting as the model serializer (pydantic-core), minus the model
+    if score is None or not math.isfinite(score):
+        return "null"
+    return to_json(score).decode()
+
+
+def render_results(results) -> str:
+    """JSON body `{"recommended_assessments": [...]}` for `recommend()`-style result dicts."""
+    frags = fragments()
+    parts = []
+    for item in results:
+        frag = frags.get(item.get("assessment_id"))
+        if frag is None:
+            parts.append(Assessment(**item).model_dump_json())
+        else:
+            parts.append(frag[0] + _score_json(item.get("score")) + frag[1])
+    return '{"recommended_assessments":[' + ",".join(parts) + "]}"
+
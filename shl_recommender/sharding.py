@@ -0,0 +1,174 @@
+"""Scatter-gather dense scoring over catalog shards held by worker processes.
+
+The L2-normalised embedding matrix is copied once into shared memory and split into
+contiguous row ranges, one per worker process. For a query the parent writes the query
+vectors (and the filter mask, if any) to a shared request block, every worker scans its
+shard in parallel and writes its local top-k (catalog ids + similarities) to its own
+result slot, and the parent merges the per-shard lists. Only a few bytes go through the
+pipes, so one query can use every core once the scan dominates.
+
+Workers are started with the "spawn" method so they are safe to create from a threaded
+server, and with the parent's `__main__` hidden, so they only import this module and
+numpy instead of re-running the server's entry point (and loading a catalog each).
+Queries are serialised on the pool (one at a time). A worker that dies makes `top_k`
+raise `WorkerLost`; the caller should drop the pool.
+"""
+import multiprocessing as mp
+import sys
+import threading
+import types
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+MAX_QUERY_ROWS = 16   # query vectors per round trip; more JD chunks take several rounds
+MAX_K = 4096          # largest per-shard top-k a request may ask for
+
+
+class WorkerLost(RuntimeError):
+    """A shard worker exited (or the pool was closed) while serving a query."""
+
+
+@contextmanager
+def _bare_main():
+    # spawn re-imports the parent's __main__ in every child unless there is none to import
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+
+def _worker(conn, emb_name, req_name, res_name, n, d, lo, hi, slot):
+    emb_shm, req_shm, res_shm = (shared_memory.SharedMemory(name=name)
+                                  for name in (emb_name, req_name, res_name))
+    emb = np.ndarray((n, d), dtype=np.float32, buffer=emb_shm.buf)[lo:hi]
+    queries = np.ndarray((MAX_QUERY_ROWS, d), dtype=np.float32, buffer=req_shm.buf)
+    mask = np.ndarray((n,), dtype=np.bool_, buffer=req_shm.buf, offset=MAX_QUERY_ROWS * d * 4)[lo:hi]
+    res_ids = np.ndarray((MAX_K,), dtype=np.int64, buffer=res_shm.buf, offset=slot * MAX_K * 12)
+    res_sims = np.ndarray((MAX_K,), dtype=np.float32, buffer=res_shm.buf, offset=slot * MAX_K * 12 + MAX_K * 8)
+    try:
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                break
+            n_rows, k, use_mask = msg
+            if n_rows == 1:
+                sims = emb @ queries[0]
+            else:
+                sims = (emb @ queries[:n_rows].T).max(axis=1)
+            cand = np.flatnonzero(mask) if use_mask else None
+            if cand is not None:
+                sims = sims[cand]
+            k = min(k, len(sims))
+            if k <= 0:
+                conn.send(0)
+                continue
+            if k < len(sims):
+                # widen to every position tied with the k-th value so ties resolve by index
+                kth = sims[np.argpartition(-sims, k - 1)[:k]].min()
+                top = np.flatnonzero(sims >= kth)
+            else:
+                top = np.arange(len(sims))
+            top = top[np.lexsort((top, -sims[top]))][:k]
+            ids = (cand[top] if cand is not None else top) + lo
+            res_ids[:k] = ids
+            res_sims[:k] = sims[top]
+            conn.send(k)
+    finally:
+        del emb, queries, mask, res_ids, res_sims
+        for shm in (emb_shm, req_shm, res_shm):
+            shm.close()
+
+
+class ShardPool:
+    """Worker processes each owning a contiguous shard of `emb_normed` rows."""
+
+    def __init__(self, emb_normed, n_shards):
+        emb_normed = np.ascontiguousarray(emb_normed, dtype=np.float32)
+        self.n, self.d = emb_normed.shape
+        self.n_shards = max(1, min(n_shards, self.n))
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._emb = shared_memory.SharedMemory(create=True, size=max(emb_normed.nbytes, 1))
+        np.ndarray(emb_normed.shape, dtype=np.float32, buffer=self._emb.buf)[:] = emb_normed
+        self._req = shared_memory.SharedMemory(create=True, size=MAX_QUERY_ROWS * self.d * 4 + self.n)
+        self._res = shared_memory.SharedMemory(create=True, size=self.n_shards * MAX_K * 12)
+        self._queries = np.ndarray((MAX_QUERY_ROWS, self.d), dtype=np.float32, buffer=self._req.buf)
+        self._mask = np.ndarray((self.n,), dtype=np.bool_, buffer=self._req.buf, offset=MAX_QUERY_ROWS * self.d * 4)
+
+        ctx = mp.get_context('spawn')
+        bounds = np.linspace(0, self.n, self.n_shards + 1).astype(int)
+        self._conns, self._procs = [], []
+        for slot in range(self.n_shards):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_worker, daemon=True,
+                               args=(child, self._emb.name, self._req.name, self._res.name,
+                                     self.n, self.d, int(bounds[slot]), int(bounds[slot + 1]), slot))
+            with _bare_main():
+                proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+    def top_k(self, queries, k, mask=None):
+        """Global top-`k` (catalog ids, similarities) of max-over-`queries` cosine, best first.
+
+        `queries` is (rows, d) normalised float32; `mask` optionally restricts the items.
+        Ties resolve to the lower catalog id, like a single-process scan. Raises
+        `WorkerLost` if a worker has died or the pool is closed.
+        """
+        queries = np.atleast_2d(queries)
+        k = min(k, MAX_K)
+        ids, sims = [], []
+        with self._lock:
+            if self._closed:
+                raise WorkerLost('shard pool is closed')
+            if mask is not None:
+                self._mask[:] = mask
+            for lo in range(0, len(queries), MAX_QUERY_ROWS):
+                group = queries[lo:lo + MAX_QUERY_ROWS]
+                self._queries[:len(group)] = group
+                try:
+                    for conn in self._conns:
+                        conn.send((len(group), k, mask is not None))
+                    counts = [conn.recv() for conn in self._conns]
+                except (OSError, EOFError) as e:
+                    raise WorkerLost(f'shard worker lost: {e!r}') from e
+                for slot, count in enumerate(counts):
+                    off = slot * MAX_K * 12
+                    ids.append(np.ndarray((count,), dtype=np.int64, buffer=self._res.buf, offset=off).copy())
+                    sims.append(np.ndarray((count,), dtype=np.float32, buffer=self._res.buf,
+                                           offset=off + MAX_K * 8).copy())
+        ids, sims = np.concatenate(ids), np.concatenate(sims)
+        order = np.lexsort((ids, -sims))
+        ids, sims = ids[order], sims[order]
+        if len(queries) > MAX_QUERY_ROWS:
+            # an item can come back from several rounds: keep its first (best) entry
+            _, first = np.unique(ids, return_index=True)
+            keep = np.sort(first)
+            ids, sims = ids[keep], sims[keep]
+        return ids[:k], sims[:k]
+
+    def close(self):
+        # under the lock, so shared memory is never unlinked under a running query
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for conn in self._conns:
+                try:
+                    conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+            for proc in self._procs:
+                proc.join(timeout=5)
+                if proc.is_alive():
+                    proc.terminate()
+            self._queries = self._mask = None
+            for shm in (self._emb, self._req, self._res):
+                shm.close()
+                shm.unlink()
@@ -1,28 +1,52 @@
 import os
 import json
 import re
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from skill_matcher import build_skill_matcher
+
 ROOT = Path(__file__).parent
 DATA = ROOT / 'data'
 ASSESS_PATH = DATA / 'shl_assessments.json'
 TRAIN_PATH = DATA / 'train.json'
 OUT_TRAIN_SKILLS = DATA / 'train_skills.json'
+CACHE_PATH = DATA / 'skill_cache.json'
 
 # Few-shot prompt pieces (kept here for clarity)
 SYSTEM_PROMPT = "You are a precise extractor of skills and assessment tags. Output JSON array of short skill tokens. Only output JSON array. If no skills, output []."
 EXAMPLE_QUERY = 'Job description: "We seek a backend developer with Python, Flask, REST APIs, SQL and strong problem solving ability."\nOutput:\n["python","flask","rest apis","sql","problem solving"]'
+# cached results are keyed by text hash + prompt version, so editing the prompt invalidates them
+PROMPT_VERSION = hashlib.sha256((SYSTEM_PROMPT + EXAMPLE_QUERY).encode('utf-8')).hexdigest()[:12]
 
 COMMON_SKILLS = [
     'python','java','javascript','c#','c++','sql','excel','power bi','react','angular','nodejs','node','django','flask','rest api','rest apis','aws','azure','gcp','docker','kubernetes','html','css','typescript','php','ruby','go','scala','r','matlab','spark','hadoop','nlp','nlp','machine learning','deep learning','data analysis','data entry','communication','leadership','management','sales','marketing','customer service'
 ]
 
+_matcher = None
+
+
+def _get_matcher():
+    """Shared skill matcher: catalog skills + COMMON_SKILLS + aliases (built once)."""
+    global _matcher
+    if _matcher is None:
+        catalog_skills = set()
+        if ASSESS_PATH.exists():
+            data = json.loads(ASSESS_PATH.read_text(encoding='utf-8'))
+            for item in data.get('recommended_assessments', []):
+                catalog_skills.update(str(s).strip().lower() for s in item.get('skills') or [])
+        _matcher = build_skill_matcher(catalog_skills)
+    return _matcher
+
+
 def fallback_extract(text):
     t = (text or '').lower()
-    found = []
-    for sk in COMMON_SKILLS:
-        if sk in t:
-            found.append(sk)
+    hits = _get_matcher().find(t)
+    found = [sk for sk in dict.fromkeys(COMMON_SKILLS) if sk in hits]
     # also extract capitalized tech tokens like 'SQL', 'C++' via regex
     caps = re.findall(r"\b[A-Za-z\+\#]{2,}\b", text or '')
     for c in caps:
@@ -43,38 +67,195 @@ def fallback_extract(text):
             normalized.append(f)
     return normalized
 
-def try_openai_extract(text):
+def build_prompt(text):
+    return SYSTEM_PROMPT + "\n\n" + EXAMPLE_QUERY + "\n\nUser query to run: \"" + text.replace('"','\"') + "\"\nOutput:"
+
+def parse_skill_array(txt):
+    """Parse the model output into a list of lowercased skills, or None if it isn't a JSON array."""
+    txt = (txt or '').strip()
     try:
-        import openai
+        arr = json.loads(txt)
+        if isinstance(arr, list):
+            return [str(a).strip().lower() for a in arr if a]
     except Exception:
-        return None  # signal not available
-    key = os.environ.get('OPENAI_API_KEY') or os.environ.get('OPENAI_KEY')
-    if not key:
-        return None
-    openai.api_key = key
-    prompt = SYSTEM_PROMPT + "\n\n" + EXAMPLE_QUERY + "\n\nUser query to run: \"" + text.replace('"','\"') + "\"\nOutput:"
+        # try to extract bracketed content
+        m = re.search(r"\[(.*)\]", txt, re.S)
+        if m:
+            try:
+                arr = json.loads(m.group(0))
+                return [str(a).strip().lower() for a in arr if a]
+            except Exception:
+                return None
+    return None
+
+
+class BackendUnavailable(Exception):
+    """The backend can't be used at all (missing package or key); don't retry."""
+
+
+class OpenAIBackend:
+    name = 'openai'
+
+    def __init__(self, model='gpt-3.5-turbo'):
+        try:
+            import openai
+        except Exception:
+            raise BackendUnavailable('openai package not installed')
+        key = os.environ.get('OPENAI_API_KEY') or os.environ.get('OPENAI_KEY')
+        if not key:
+            raise BackendUnavailable('OPENAI_API_KEY not set')
+        openai.api_key = key
+        self._openai = openai
+        self.model = model
+
+    def __call__(self, text):
+        resp = self._openai.Completion.create(model=self.model, prompt=build_prompt(text), max_tokens=200, temperature=0)
+        return parse_skill_array(resp.choices[0].text)
+
+
+class HTTPBackend:
+    """POSTs {"prompt", "text", "prompt_version"} to `url`; expects {"skills": [...]} or {"text": "[...]"}.
+
+    Used with scripts/stub_llm_server.py for local runs and tests.
+    """
+    name = 'http'
+
+    def __init__(self, url, timeout=30):
+        import requests
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def __call__(self, text):
+        resp = self._session.post(self.url, json={'prompt': build_prompt(text), 'text': text,
+                                                  'prompt_version': PROMPT_VERSION}, timeout=self.timeout)
+        resp.raise_for_status()
+        body = resp.json()
+        if isinstance(body.get('skills'), list):
+            return [str(a).strip().lower() for a in body['skills'] if a]
+        return parse_skill_array(body.get('text'))
+
+
+class FallbackBackend:
+    name = 'fallback'
+
+    def __call__(self, text):
+        return fallback_extract(text)
+
+
+def get_backend(name=None):
+    """Backend from `name` or $SKILL_EXTRACT_BACKEND (openai | http | fallback); None if unavailable."""
+    name = name or os.environ.get('SKILL_EXTRACT_BACKEND', 'openai')
     try:
-        resp = openai.Completion.create(model='gpt-3.5-turbo', prompt=prompt, max_tokens=200, temperature=0)
-        txt = resp.choices[0].text.strip()
-        # attempt to parse JSON array
-        import json as _json
+        if name == 'openai':
+            return OpenAIBackend()
+        if name == 'http':
+            return HTTPBackend(os.environ.get('SKILL_EXTRACT_URL', 'http://127.0.0.1:8765/extract'))
+        if name == 'fallback':
+            return FallbackBackend()
+    except BackendUnavailable:
+        return None
+    raise ValueError(f'Unknown skill extraction backend: {name}')
+
+
+class SkillCache:
+    """Persistent {key: skills} JSON cache; key = sha256(text) + prompt version + backend."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data = {}
+        self._dirty = False
+        if self.path.exists():
+            try:
+                self._data = json.loads(self.path.read_text(encoding='utf-8'))
+            except Exception:
+                self._data = {}
+
+    @staticmethod
+    def key(text, backend_name):
+        digest = hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+        return f'{digest}:{PROMPT_VERSION}:{backend_name}'
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def put(self, key, skills):
+        with self._lock:
+            self._data[key] = skills
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp = self.path.with_suffix('.tmp')
+            tmp.write_text(json.dumps(self._data, ensure_ascii=False), encoding='utf-8')
+            tmp.replace(self.path)
+            self._dirty = False
+
+
+def _call_with_retry(backend, text, retries, backoff):
+    for attempt in range(retries + 1):
         try:
-            arr = _json.loads(txt)
-            if isinstance(arr, list):
-                return [str(a).strip().lower() for a in arr if a]
+            return backend(text)
         except Exception:
-            # try to extract bracketed content
-            m = re.search(r"\[(.*)\]", txt, re.S)
-            if m:
-                inner = m.group(0)
-                try:
-                    arr = _json.loads(inner)
-                    return [str(a).strip().lower() for a in arr if a]
-                except Exception:
-                    return None
+            if attempt == retries:
+                return None
+            # exponential backoff with jitter
+            time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+    return None
+
+
+def extract_skills_batch(texts, backend=None, workers=8, cache=None, retries=3, backoff=0.5, flush_every=100):
+    """Extract skills for many texts; returns a list aligned with `texts`.
+
+    Identical texts are extracted once, cached results are reused, and the rest run on
+    a bounded thread pool with retry/backoff. Texts the backend can't handle fall back
+    to `fallback_extract()` (not cached, so a later run retries the backend).
+    """
+    texts = [t or '' for t in texts]
+    if backend is None:
+        backend = get_backend()
+    if backend is None:
+        return [fallback_extract(t) for t in texts]
+
+    results = {}
+    pending = []
+    for t in dict.fromkeys(texts):
+        cached = cache.get(SkillCache.key(t, backend.name)) if cache is not None else None
+        if cached is not None:
+            results[t] = cached
+        else:
+            pending.append(t)
+
+    done = 0
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for t, skills in zip(pending, pool.map(lambda t: _call_with_retry(backend, t, retries, backoff), pending)):
+                if skills is None:
+                    results[t] = fallback_extract(t)
+                    continue
+                results[t] = skills
+                if cache is not None:
+                    cache.put(SkillCache.key(t, backend.name), skills)
+                    done += 1
+                    if done % flush_every == 0:
+                        cache.save()
+    if cache is not None:
+        cache.save()
+    print(f'Skill extraction: {len(texts)} texts, {len(texts) - len(pending)} cached/duplicate, {len(pending)} sent to {backend.name}')
+    return [results[t] for t in texts]
+
+def try_openai_extract(text):
+    try:
+        backend = OpenAIBackend()
+    except BackendUnavailable:
+        return None  # signal not available
+    try:
+        return backend(text)
     except Exception:
         return None
-    return None
 
 def extract_skills(text):
     # try LLM first (if available), otherwise fallback
@@ -86,15 +267,15 @@ def extract_skills(text):
         return []
     return fallback_extract(text)
 
-def update_assessments_with_skills():
+def update_assessments_with_skills(backend=None, workers=8, cache=None):
     if not ASSESS_PATH.exists():
         print('Assessments file not found at', ASSESS_PATH)
         return
     data = json.loads(ASSESS_PATH.read_text(encoding='utf-8'))
+    items = data.get('recommended_assessments', [])
+    sources = [(item.get('description') or '') + ' ' + ' '.join(item.get('test_type', [])) for item in items]
     changed = 0
-    for item in data.get('recommended_assessments', []):
-        src = (item.get('description') or '') + ' ' + ' '.join(item.get('test_type', []))
-        skills = extract_skills(src)
+    for item, skills in zip(items, extract_skills_batch(sources, backend=backend, workers=workers, cache=cache)):
         if skills:
             item['skills'] = skills
             changed += 1
@@ -103,20 +284,28 @@ def update_assessments_with_skills():
     ASSESS_PATH.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding='utf-8')
     print(f'Updated {changed} assessments with extracted skills')
 
-def extract_train_skills():
+def extract_train_skills(backend=None, workers=8, cache=None):
     if not TRAIN_PATH.exists():
         print('Train file not found at', TRAIN_PATH)
         return
     train = json.loads(TRAIN_PATH.read_text(encoding='utf-8'))
-    out = []
-    for ex in train:
-        q = ex.get('query')
-        skills = extract_skills(q)
-        out.append({'query': q, 'skills': skills})
+    queries = [ex.get('query') for ex in train]
+    skills = extract_skills_batch(queries, backend=backend, workers=workers, cache=cache)
+    out = [{'query': q, 'skills': s} for q, s in zip(queries, skills)]
     OUT_TRAIN_SKILLS.write_text(json.dumps(out, indent=2, ensure_ascii=False), encoding='utf-8')
     print(f'Wrote train skills for {len(out)} examples to {OUT_TRAIN_SKILLS}')
 
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Extract skills for the catalog and train queries.')
+    parser.add_argument('--backend', choices=('openai', 'http', 'fallback'), default=None,
+                        help='default: $SKILL_EXTRACT_BACKEND or openai (regex fallback if unavailable)')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent backend calls')
+    parser.add_argument('--no-cache', action='store_true', help=f'ignore and do not update {CACHE_PATH.name}')
+    args = parser.parse_args()
+
     print('Running skill extractor. OpenAI use is optional; falling back to regex if unavailable.')
-    update_assessments_with_skills()
-    extract_train_skills()
+    backend = get_backend(args.backend)
+    cache = None if args.no_cache else SkillCache()
+    update_assessments_with_skills(backend=backend, workers=args.workers, cache=cache)
+    extract_train_skills(backend=backend, workers=args.workers, cache=cache)
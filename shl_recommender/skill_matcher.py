@@ -0,0 +1,85 @@
+"""Compiled multi-pattern skill matcher (Aho-Corasick automaton).
+
+One automaton is built from the union of catalog skills, `skill_extractor.COMMON_SKILLS`
+and the skill `ALIASES`; `find()` reports every pattern occurring in a text in a single
+left-to-right pass, so matching cost no longer grows with skills x tokens.
+
+Used online by `recommender._matched_skills()` and offline by
+`skill_extractor.fallback_extract()`.
+"""
+from collections import deque
+
+# surface form -> canonical skill
+ALIASES = {"js": "javascript", "nodejs": "javascript", "csharp": "c#"}
+
+
+class SkillMatcher:
+    """Aho-Corasick automaton over a fixed set of patterns."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self.patterns = set()
+        for p in patterns:
+            if p:
+                self._add(p)
+        self._build()
+
+    def _add(self, pattern):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] = self._out[node] + (pattern,)
+        self.patterns.add(pattern)
+
+    def _build(self):
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                # inherit matches ending at the fallback state
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+    def find(self, text):
+        """Set of patterns occurring anywhere in `text` (overlaps included)."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+def canonical(skill):
+    return ALIASES.get(skill, skill)
+
+
+def build_skill_matcher(catalog_skills=()):
+    """Matcher over catalog skills + COMMON_SKILLS + ALIASES (surface forms and targets)."""
+    from skill_extractor import COMMON_SKILLS
+
+    patterns = set(catalog_skills)
+    patterns.update(COMMON_SKILLS)
+    patterns.update(ALIASES)
+    patterns.update(ALIASES.values())
+    return SkillMatcher(sorted(patterns))
@@ -0,0 +1,160 @@
+"""Generate synthetic SHL-style catalogs with matching embeddings for scale testing.
+
+Items are drawn from a fixed set of topics (programming, data, sales, personality,
+cognitive, ...). Each item gets a title, description, skills, test types, duration and
+remote/adaptive flags, and an embedding built from its topic centroid plus its skills,
+so items that share a topic or skills land close together in embedding space, like the
+real e5 embeddings do.
+
+Run:
+  python synthetic_catalog.py --size 50000 --out data/synthetic_50k
+  -> data/synthetic_50k.json (catalog) and data/synthetic_50k.npy (float32 embeddings)
+"""
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+EMBED_DIM = 384
+
+TOPICS = {
+    'software': {
+        'skills': ['java', 'python', 'javascript', 'c#', 'c++', 'sql', 'react', 'angular', 'django', 'flask',
+                   'rest apis', 'docker', 'kubernetes', 'aws', 'azure', 'typescript', 'go', 'spring boot'],
+        'nouns': ['Developer', 'Programming', 'Engineering', 'Coding Simulation', 'Framework'],
+        'types': ['K', 'S'],
+    },
+    'data': {
+        'skills': ['sql', 'excel', 'power bi', 'data analysis', 'machine learning', 'statistics', 'spark',
+                   'hadoop', 'tableau', 'r', 'python', 'deep learning', 'nlp'],
+        'nouns': ['Data Analyst', 'Analytics', 'Data Science', 'Reporting', 'Business Intelligence'],
+        'types': ['K', 'A'],
+    },
+    'sales': {
+        'skills': ['sales', 'negotiation', 'marketing', 'customer relationship', 'communication',
+                   'persuasion', 'account management', 'lead generation'],
+        'nouns': ['Sales Representative', 'Account Manager', 'Sales Solution', 'Business Development'],
+        'types': ['P', 'B', 'C'],
+    },
+    'service': {
+        'skills': ['customer service', 'communication', 'data entry', 'empathy', 'problem solving',
+                   'call handling', 'crm', 'attention to detail'],
+        'nouns': ['Customer Service', 'Contact Center', 'Call Simulation', 'Support Representative'],
+        'types': ['B', 'S', 'P'],
+    },
+    'leadership': {
+        'skills': ['leadership', 'management', 'decision making', 'strategy', 'coaching', 'delegation',
+                   'stakeholder management', 'communication'],
+        'nouns': ['Manager', 'Leadership Report', 'Executive', 'Director', 'Team Lead'],
+        'types': ['P', 'D', 'C'],
+    },
+    'cognitive': {
+        'skills': ['numerical reasoning', 'verbal reasoning', 'inductive reasoning', 'deductive reasoning',
+                   'problem solving', 'attention to detail'],
+        'nouns': ['Reasoning', 'Ability Test', 'Aptitude', 'Cognitive Assessment'],
+        'types': ['A'],
+    },
+    'personality': {
+        'skills': ['teamwork', 'resilience', 'adaptability', 'motivation', 'integrity', 'work ethic'],
+        'nouns': ['Personality Questionnaire', 'Motivation Questionnaire', 'Behavioral Profile', 'Workplace Styles'],
+        'types': ['P', 'B'],
+    },
+}
+LEVELS = ['Entry Level', 'Graduate', 'Junior', 'Mid-Level', 'Senior', 'Lead', 'Manager', 'Director']
+QUALIFIERS = ['(New)', 'Essentials', 'Advanced', 'Fundamentals', 'Interactive', 'Short Form', '8.0', '2.0']
+SENTENCES = [
+    'Multi-choice test that measures {s0} and {s1} knowledge.',
+    'Candidates are evaluated on {s0} through realistic work scenarios.',
+    'Designed for {level} roles that require {s0}, {s1} and {s2}.',
+    'Covers the following topics: {skills}.',
+    'This assessment helps hiring managers identify strong {noun} candidates.',
+    'The report summarises performance on {s1} relative to a global norm group.',
+]
+
+
+def _skill_vectors(rng, vocab):
+    vecs = rng.standard_normal((len(vocab), EMBED_DIM)).astype(np.float32)
+    return {s: v for s, v in zip(vocab, vecs)}
+
+
+def generate(size, seed=0, chunk_size=50000):
+    """Return (items, embeddings) for a synthetic catalog of `size` items."""
+    rng = np.random.default_rng(seed)
+    topic_names = list(TOPICS)
+    topic_weights = np.array([0.3, 0.15, 0.12, 0.12, 0.1, 0.11, 0.1])
+    centroids = rng.standard_normal((len(topic_names), EMBED_DIM)).astype(np.float32) * 2.0
+    vocab = sorted({s for t in TOPICS.values() for s in t['skills']})
+    skill_vecs = _skill_vectors(rng, vocab)
+
+    items = []
+    embeddings = np.empty((size, EMBED_DIM), dtype=np.float32)
+    topic_ids = rng.choice(len(topic_names), size=size, p=topic_weights / topic_weights.sum())
+
+    for start in range(0, size, chunk_size):
+        stop = min(start + chunk_size, size)
+        noise = rng.standard_normal((stop - start, EMBED_DIM)).astype(np.float32) * 0.6
+        for j, i in enumerate(range(start, stop)):
+            name = topic_names[topic_ids[i]]
+            topic = TOPICS[name]
+            n_sk = int(rng.integers(2, 7))
+            skills = list(rng.choice(topic['skills'], size=min(n_sk, len(topic['skills'])), replace=False))
+            level = LEVELS[int(rng.integers(len(LEVELS)))]
+            noun = topic['nouns'][int(rng.integers(len(topic['nouns'])))]
+            qual = QUALIFIERS[int(rng.integers(len(QUALIFIERS)))]
+            title = f"{skills[0].title()} {noun} {qual}" if rng.random() < 0.6 else f"{level} {noun} {qual}"
+            fill = {'s0': skills[0], 's1': skills[1 % len(skills)], 's2': skills[2 % len(skills)],
+                    'skills': ', '.join(skills), 'level': level.lower(), 'noun': noun.lower()}
+            picked = rng.choice(len(SENTENCES), size=3, replace=False)
+            full = ' '.join(SENTENCES[k].format(**fill) for k in picked)
+            n_types = int(rng.integers(1, 3))
+            test_type = sorted(set(rng.choice(topic['types'], size=n_types)))
+            duration = int(rng.choice([5, 10, 15, 20, 25, 30, 36, 45, 60, 90])) if rng.random() < 0.8 else None
+            slug = f"{title.lower().replace(' ', '-').replace('(', '').replace(')', '').replace('.', '-')}-{i}"
+
+            items.append({
+                'url': f"https://www.shl.com/products/product-catalog/view/{slug}/",
+                'assessment_id': slug,
+                'description': title,
+                'full_description': full,
+                'duration': duration,
+                'remote_support': 'Yes' if rng.random() < 0.85 else 'No',
+                'adaptive_support': 'Yes' if rng.random() < 0.25 else 'No',
+                'test_type': [str(t) for t in test_type],
+                'skills': [str(s) for s in skills],
+            })
+
+            vec = centroids[topic_ids[i]] + noise[j]
+            for s in skills:
+                vec = vec + skill_vecs[s]
+            embeddings[i] = vec
+        embeddings[start:stop] /= np.linalg.norm(embeddings[start:stop], axis=1, keepdims=True) + 1e-12
+
+    return items, embeddings
+
+
+def write(items, embeddings, out_prefix):
+    out_prefix = Path(out_prefix)
+    out_prefix.parent.mkdir(parents=True, exist_ok=True)
+    catalog_path = out_prefix.with_suffix('.json')
+    emb_path = out_prefix.with_suffix('.npy')
+    with open(catalog_path, 'w', encoding='utf-8') as f:
+        json.dump({'recommended_assessments': items}, f, ensure_ascii=False)
+    np.save(emb_path, embeddings)
+    return catalog_path, emb_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic assessment catalog with embeddings.')
+    parser.add_argument('--size', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='output path prefix (default: data/synthetic_<size>)')
+    args = parser.parse_args()
+
+    items, embeddings = generate(args.size, seed=args.seed)
+    catalog_path, emb_path = write(items, embeddings, args.out or f"data/synthetic_{args.size}")
+    print(f"Wrote {len(items)} items to {catalog_path} and {embeddings.shape} embeddings to {emb_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules import each other flat and read data/ relative to the shl_recommender folder
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
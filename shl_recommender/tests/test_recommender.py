@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def test_import_with_int8_tier():
+    # the tier's recall check encodes queries while the module is still importing
+    env = dict(os.environ, SHL_QUANTIZE="1", SHL_CANDIDATE_N="100")
+    out = subprocess.run([sys.executable, "-c", "import recommender; print(recommender._quantized is not None)"],
+                         cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip().endswith("True")
+
+
+def test_balanced_mixes_knowledge_and_personality():
+    import recommender
+
+    query = "Looking for a Java developer who collaborates well with business teams"
+    results = recommender.recommend_balanced(query, top_k=10, prefer_ratio=0.5)
+    types = [set(recommender._item_test_types(r)) for r in results]
+    assert sum("K" in t and "P" not in t for t in types) == 5
+    assert sum("P" in t and "K" not in t for t in types) == 5
+    assert results != recommender.recommend(query, top_k=10)
@@ -0,0 +1,129 @@
+"""Startup warm-up: replay known queries through the pipeline before reporting ready.
+
+Queries come from the sources in `SHL_WARMUP_SOURCES` (comma separated, in order):
+`log` (the newest lines of the query log), `test` (data/test.json) and `train`
+(data/train.json). Each distinct query runs through `recommend()` and
+`recommend_balanced()` with the API defaults, which fills the query and result caches
+and exercises the cold code paths, until `SHL_WARMUP_BUDGET_S` runs out. The response
+fragments of the current snapshot (serialization.py) are built first.
+
+The query log is written by main.py when `SHL_QUERY_LOG` is set (JSONL, one
+`{"ts", "job_description"}` per request). Once it reaches `SHL_QUERY_LOG_MAX_BYTES` it
+is rotated to `<log>.1` (replacing the previous one), so it stays bounded.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import recommender
+import serialization
+
+WARMUP_SOURCES = os.environ.get('SHL_WARMUP_SOURCES', 'log,test,train')
+WARMUP_BUDGET_S = float(os.environ.get('SHL_WARMUP_BUDGET_S', '10'))
+QUERY_LOG = os.environ.get('SHL_QUERY_LOG', '')
+QUERY_LOG_WARMUP_LINES = int(os.environ.get('SHL_QUERY_LOG_WARMUP_LINES', '2000'))
+QUERY_LOG_MAX_BYTES = int(os.environ.get('SHL_QUERY_LOG_MAX_BYTES', str(64 * 1024 * 1024)))
+_MAX_LOGGED_CHARS = 20000
+
+_SOURCES = {
+    'test': os.path.join('data', 'test.json'),
+    'train': os.path.join('data', 'train.json'),
+}
+
+_log_lock = threading.Lock()
+_log_file = None  # kept open (line buffered) between requests
+
+
+def record_query(job_description):
+    """Append a served JD to the query log (no-op unless SHL_QUERY_LOG is set)."""
+    global _log_file
+    if not QUERY_LOG or not job_description:
+        return
+    line = json.dumps({'ts': round(time.time(), 3), 'job_description': job_description[:_MAX_LOGGED_CHARS]},
+                      ensure_ascii=False)
+    try:
+        with _log_lock:
+            if _log_file is None:
+                _log_file = open(QUERY_LOG, 'a', encoding='utf-8', buffering=1)
+            _log_file.write(line + '\n')
+            if _log_file.tell() >= QUERY_LOG_MAX_BYTES:
+                _log_file.close()
+                _log_file = None
+                os.replace(QUERY_LOG, QUERY_LOG + '.1')
+    except OSError:
+        _log_file = None
+
+
+def _log_queries(path, limit):
+    if not path:
+        return []
+    lines = deque(maxlen=limit)
+    for name in (path + '.1', path):  # rotated (older) lines first
+        if os.path.exists(name):
+            with open(name, 'r', encoding='utf-8') as f:
+                lines.extend(f)
+    out = []
+    # newest first: recent traffic is the most likely to repeat
+    for line in reversed(lines):
+        try:
+            q = json.loads(line).get('job_description')
+        except ValueError:
+            continue
+        if q:
+            out.append(q)
+    return out
+
+
+def load_queries(sources=None):
+    """Distinct warm-up queries from `sources` (default `SHL_WARMUP_SOURCES`), in priority order."""
+    queries = []
+    for name in (sources or WARMUP_SOURCES).split(','):
+        name = name.strip()
+        if name == 'log':
+            queries.extend(_log_queries(QUERY_LOG, QUERY_LOG_WARMUP_LINES))
+        elif name in _SOURCES and os.path.exists(_SOURCES[name]):
+            with open(_SOURCES[name], 'r', encoding='utf-8') as f:
+                queries.extend(r.get('query') for r in json.load(f))
+    return [q for q in dict.fromkeys(queries) if q]
+
+
+def warm_up(queries=None, budget_s=None):
+    """Run `queries` through the pipeline until done or out of budget; returns a summary."""
+    queries = load_queries() if queries is None else queries
+    budget_s = WARMUP_BUDGET_S if budget_s is None else budget_s
+    t0 = time.perf_counter()
+    serialization.fragments()
+    done = 0
+    for q in queries:
+        if time.perf_counter() - t0 >= budget_s:
+            break
+        recommender.recommend(q, top_k=10)
+        recommender.recommend_balanced(q, top_k=10)
+        done += 1
+    return {'queries': len(queries), 'warmed': done, 'seconds': round(time.perf_counter() - t0, 3)}
+
+
+class Readiness:
+    """Tracks the warm-up run so /ready can report it separately from /health."""
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.summary = None
+
+    def start(self, enabled=True):
+        if not enabled:
+            self.summary = {'skipped': True}
+            self.ready.set()
+            return
+        threading.Thread(target=self._run, name='warmup', daemon=True).start()
+
+    def _run(self):
+        try:
+            self.summary = warm_up()
+        except Exception as e:
+            # a failed warm-up only costs latency; never keep the instance out of rotation
+            self.summary = {'error': str(e)}
+        finally:
+            self.ready.set()